@@ -0,0 +1,44 @@
+"""Add scenes table
+
+Revision ID: 7c1e4b9a2d53
+Revises: 0233e7288581
+Create Date: 2026-10-17 09:12:44.518302+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e4b9a2d53'
+down_revision: Union[str, None] = '0233e7288581'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'scenes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('video_id', sa.Integer(), nullable=False),
+        sa.Column('detector_key', sa.String(), nullable=False),
+        sa.Column('scene_index', sa.Integer(), nullable=False),
+        sa.Column('start_frame', sa.Integer(), nullable=False),
+        sa.Column('end_frame', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.Float(), nullable=False),
+        sa.Column('end_time', sa.Float(), nullable=False),
+        sa.Column('layout', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['video_id'], ['videos.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('video_id', 'detector_key', 'scene_index', name='uq_scenes_video_detector_index')
+    )
+    op.create_index(op.f('ix_scenes_id'), 'scenes', ['id'], unique=False)
+    op.create_index(op.f('ix_scenes_video_id'), 'scenes', ['video_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_scenes_video_id'), table_name='scenes')
+    op.drop_index(op.f('ix_scenes_id'), table_name='scenes')
+    op.drop_table('scenes')
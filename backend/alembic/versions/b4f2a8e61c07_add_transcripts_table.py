@@ -0,0 +1,40 @@
+"""Add transcripts table
+
+Revision ID: b4f2a8e61c07
+Revises: 7c1e4b9a2d53
+Create Date: 2026-10-17 15:40:12.904117+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4f2a8e61c07'
+down_revision: Union[str, None] = '7c1e4b9a2d53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'transcripts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('video_id', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.String(), nullable=False),
+        sa.Column('model', sa.String(), nullable=False),
+        sa.Column('segments', sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(['video_id'], ['videos.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('video_id', 'content_hash', 'model', name='uq_transcripts_video_hash_model')
+    )
+    op.create_index(op.f('ix_transcripts_id'), 'transcripts', ['id'], unique=False)
+    op.create_index(op.f('ix_transcripts_video_id'), 'transcripts', ['video_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_transcripts_video_id'), table_name='transcripts')
+    op.drop_index(op.f('ix_transcripts_id'), table_name='transcripts')
+    op.drop_table('transcripts')
@@ -0,0 +1,29 @@
+"""Add scene_detection job type
+
+Revision ID: e3a9c5d17f42
+Revises: b4f2a8e61c07
+Create Date: 2026-10-17 18:22:41.530216+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a9c5d17f42'
+down_revision: Union[str, None] = 'b4f2a8e61c07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ALTER TYPE ... ADD VALUE cannot run inside a transaction block before PostgreSQL 12
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE jobtype ADD VALUE IF NOT EXISTS 'scene_detection'")
+
+
+def downgrade() -> None:
+    # PostgreSQL cannot drop a value from an enum type; only the jobs using it are removed
+    op.execute("DELETE FROM processing_jobs WHERE job_type = 'scene_detection'")
@@ -0,0 +1,26 @@
+"""Add detector_key to processing_jobs
+
+Revision ID: f1b7d2c90a38
+Revises: e3a9c5d17f42
+Create Date: 2026-10-17 20:05:13.118402+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b7d2c90a38'
+down_revision: Union[str, None] = 'e3a9c5d17f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('processing_jobs', sa.Column('detector_key', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('processing_jobs', 'detector_key')
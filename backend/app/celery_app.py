@@ -1,6 +1,7 @@
 # backend/app/celery_app.py
 
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 from app.config import settings
 import logging
 
@@ -18,7 +19,7 @@ celery.conf.update(
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
-    worker_concurrency=8, 
+    worker_concurrency=settings.WORKER_CONCURRENCY,
     broker_connection_retry_on_startup=True,  
 )
 
@@ -30,3 +31,25 @@ logging.basicConfig(
 
 # Autodiscover tasks from the 'app.services' package
 celery.autodiscover_tasks(['app.services'])
+
+_models_warmed = False
+
+def _warm_models():
+    global _models_warmed
+    if _models_warmed or not settings.WARM_MODELS_ON_START:
+        return
+    _models_warmed = True
+    from app.utils.model_registry import warm_models
+    warm_models()
+
+@worker_process_init.connect
+def warm_models_in_pool_process(**kwargs):
+    # Prefork pool: each child process loads its own models
+    _warm_models()
+
+@worker_init.connect
+def warm_models_in_worker(sender=None, **kwargs):
+    # Thread and solo pools run tasks in this process; prefork children warm up themselves,
+    # and sessions loaded here would not survive the fork
+    if 'prefork' not in str(getattr(sender, 'pool_cls', '')):
+        _warm_models()
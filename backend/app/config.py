@@ -17,6 +17,53 @@ class Settings(BaseSettings):
     SUPABASE_KEY: str
     SUPABASE_SERVICE_KEY: str 
     JWT_SECRET: str
+    # Max decoded frames held in the look-ahead buffer of iter_frames
+    FRAME_BUFFER_SIZE: int = 32
+    # Worker processes for parallel segment rendering (0 = one per CPU core)
+    RENDER_WORKERS: int = 0
+    # Target segment length for distributed (Celery chord) rendering
+    DISTRIBUTED_SEGMENT_SECONDS: int = 120
+    # Sources of distributed segments kept on disk per worker process, shared by its tasks
+    SEGMENT_SOURCE_CACHE_SIZE: int = 2
+    # Default scene detection engine: mean_diff, histogram, adaptive or scdet
+    SCENE_DETECTION_ENGINE: str = "mean_diff"
+    # Worker processes for chunk-parallel detect_scenes (0 = one per CPU core, 1 = sequential)
+    SCENE_DETECTION_WORKERS: int = 0
+    # Width of the luma plane scene detection compares (0 = full source resolution)
+    SCENE_ANALYSIS_WIDTH: int = 320
+    # Preview renders: leading seconds rendered, or seconds kept from each sampled scene
+    PREVIEW_SECONDS: int = 15
+    PREVIEW_SCENE_SECONDS: int = 3
+    # Largest preview a request may ask for
+    PREVIEW_MAX_SECONDS: int = 120
+    PREVIEW_MAX_SCENES: int = 20
+    # Sampled frames (and aligned faces) per batched face-analysis inference
+    FACE_BATCH_SIZE: int = 16
+    # Smallest face expected, as a share of frame height; sets the face detector input size
+    FACE_MIN_FACE_RATIO: float = 0.1
+    # Concurrent tasks per Celery worker; keep in step with --concurrency in start_backend.sh
+    WORKER_CONCURRENCY: int = 8
+    # Face analysis sessions per worker process (0 = one per concurrent task)
+    FACE_SESSION_POOL_SIZE: int = 0
+    # Checksummed model weights (see app.utils.model_registry); without them models are downloaded
+    MODEL_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_artifacts")
+    # Fail instead of downloading when a model artifact is missing
+    MODELS_OFFLINE: bool = False
+    # Load models when a worker process starts instead of on the first task
+    WARM_MODELS_ON_START: bool = True
+    WHISPER_MODEL: str = "base"
+    # "cpu" or "cuda"; empty picks cuda when available
+    WHISPER_DEVICE: str = ""
+    # Whisper models kept resident per worker process, and seconds unused before unloading
+    WHISPER_CACHE_SIZE: int = 1
+    WHISPER_IDLE_SECONDS: int = 900
+    # Audio at least this long is transcribed in ASR_CHUNK_SECONDS chunks split at pauses,
+    # on ASR_WORKERS processes (0 = CPU cores / WORKER_CONCURRENCY, 1 = always one pass)
+    ASR_CHUNKED_MIN_SECONDS: int = 600
+    ASR_CHUNK_SECONDS: int = 60
+    ASR_WORKERS: int = 0
+    # Store per-word timings with transcripts
+    ASR_WORD_TIMESTAMPS: bool = False
 
     class Config:
         env_file = ".env"  
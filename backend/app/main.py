@@ -17,7 +17,8 @@ from app.routes import (
     user_routes, 
     task_routes, 
     tag_routes, 
-    video_routes
+    video_routes,
+    scene_detection_routes
 )
 import os
 import logging
@@ -51,6 +52,7 @@ app.include_router(user_routes.router)
 app.include_router(task_routes.router)
 app.include_router(tag_routes.router)
 app.include_router(video_routes.router)
+app.include_router(scene_detection_routes.router)
 
 # Serve the thumbnails directory
 app.mount("/thumbnails", StaticFiles(directory="app/thumbnails"), name="thumbnails")
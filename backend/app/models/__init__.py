@@ -3,6 +3,8 @@
 from .processing_job import ProcessingJob, JobStatus, JobType
 from .video import Video, VideoStatus
 from .speaker import Speaker
+from .scene import Scene
+from .transcript import Transcript
 from .user import User  
 from .task import Task, Tag, TaskStatus  
 
@@ -13,6 +15,8 @@ __all__ = [
     "Video",
     "VideoStatus",
     "Speaker",
+    "Scene",
+    "Transcript",
     "User",
     "Task",
     "Tag",
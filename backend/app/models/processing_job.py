@@ -15,6 +15,7 @@ class JobStatus(str, enum.Enum):
 class JobType(enum.Enum):
     SPEAKER_DETECTION = "speaker_detection"
     VIDEO_PROCESSING = "video_processing"
+    SCENE_DETECTION = "scene_detection"
 
 class ProcessingJob(Base):
     __tablename__ = "processing_jobs"
@@ -38,5 +39,7 @@ class ProcessingJob(Base):
         nullable=False
     )
     processed_video_path = Column(String, nullable=True)
+    # Scene detector a SCENE_DETECTION job runs, see scene_detector_key()
+    detector_key = Column(String, nullable=True)
 
     video = relationship("Video", back_populates="processing_jobs")
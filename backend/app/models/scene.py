@@ -0,0 +1,23 @@
+# backend/app/models/scene.py
+
+from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from .base import Base
+
+class Scene(Base):
+    __tablename__ = 'scenes'
+    __table_args__ = (
+        UniqueConstraint('video_id', 'detector_key', 'scene_index', name='uq_scenes_video_detector_index'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    video_id = Column(Integer, ForeignKey('videos.id', ondelete='CASCADE'), nullable=False, index=True)
+    detector_key = Column(String, nullable=False)  # Engine and settings, see scene_detector_key()
+    scene_index = Column(Integer, nullable=False)
+    start_frame = Column(Integer, nullable=False)
+    end_frame = Column(Integer, nullable=False)
+    start_time = Column(Float, nullable=False)
+    end_time = Column(Float, nullable=False)
+    layout = Column(Text, nullable=True)  # JSON-encoded identified speakers and layout_config
+
+    video = relationship("Video", back_populates="scenes")
@@ -0,0 +1,19 @@
+# backend/app/models/transcript.py
+
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from .base import Base
+
+class Transcript(Base):
+    __tablename__ = 'transcripts'
+    __table_args__ = (
+        UniqueConstraint('video_id', 'content_hash', 'model', name='uq_transcripts_video_hash_model'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    video_id = Column(Integer, ForeignKey('videos.id', ondelete='CASCADE'), nullable=False, index=True)
+    content_hash = Column(String, nullable=False)  # sha256 of the transcribed source file
+    model = Column(String, nullable=False)  # See transcript_model_key()
+    segments = Column(Text, nullable=False)  # JSON list of {'start', 'end', 'text'[, 'words']}
+
+    video = relationship("Video", back_populates="transcripts")
@@ -29,6 +29,8 @@ class Video(Base):
 
     owner = relationship("User", back_populates="videos")
     speakers = relationship("Speaker", back_populates="video")
+    scenes = relationship("Scene", back_populates="video", cascade="all, delete-orphan")
+    transcripts = relationship("Transcript", back_populates="video", cascade="all, delete-orphan")
     
     processing_jobs = relationship(
         "ProcessingJob",
@@ -1,11 +1,15 @@
 # backend/app/routes/process_routes.py
 
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from app.models import Video, ProcessingJob, JobStatus, JobType
-from app.services.video_processing import process_video_task
+from app.services.video_processing import process_video_task, preview_video_task
+from app.services.rendering import RenderMode
+from app.utils.scene_detectors import SceneEngine
+from app.utils.encoding import EncodingProfile
+from app.config import settings
 from app.database import get_db
 import logging
 
@@ -58,6 +62,12 @@ async def process_video_endpoint(request: ProcessRequest, db: Session = Depends(
 class SimpleProcessRequest(BaseModel):
     video_id: int
     auto_captions: Optional[bool] = False
+    detect_speakers: Optional[bool] = False
+    render_mode: Optional[RenderMode] = RenderMode.FRAMES
+    # Defaults to the profile of the owner's subscription plan
+    encoding_profile: Optional[EncodingProfile] = None
+    # Defaults to settings.SCENE_DETECTION_ENGINE
+    scene_engine: Optional[SceneEngine] = None
 
 @router.post("/process_video_simple")
 async def process_video_simple(req: SimpleProcessRequest, db: Session = Depends(get_db)):
@@ -75,5 +85,54 @@ async def process_video_simple(req: SimpleProcessRequest, db: Session = Depends(
     db.commit()
     db.refresh(processing_job)
 
-    process_video_task.delay(video.id, processing_job.id, req.auto_captions)
+    process_video_task.delay(
+        video.id,
+        processing_job.id,
+        req.auto_captions,
+        req.detect_speakers,
+        req.render_mode.value,
+        req.encoding_profile.value if req.encoding_profile else None,
+        req.scene_engine.value if req.scene_engine else None
+    )
+    return {"job_id": processing_job.id}
+
+
+class PreviewRequest(BaseModel):
+    video_id: int
+    auto_captions: Optional[bool] = False
+    # Leading seconds to render; defaults to settings.PREVIEW_SECONDS
+    preview_seconds: Optional[int] = Field(None, gt=0, le=settings.PREVIEW_MAX_SECONDS)
+    # Render this many sampled scenes instead of the leading seconds
+    preview_scenes: Optional[int] = Field(None, gt=0, le=settings.PREVIEW_MAX_SCENES)
+    # Use the same engine as the final render so the previewed cuts match
+    scene_engine: Optional[SceneEngine] = None
+
+@router.post("/process_video_preview")
+async def process_video_preview(req: PreviewRequest, db: Session = Depends(get_db)):
+    """
+    Start a low-resolution preview render. Poll /status/{job_id}; the preview URL is
+    returned as job_output_path.
+    """
+    video = db.query(Video).filter(Video.id == req.video_id).first()
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    processing_job = ProcessingJob(
+        video_id=video.id,
+        status=JobStatus.PENDING,
+        progress=0.0,
+        job_type=JobType.VIDEO_PROCESSING
+    )
+    db.add(processing_job)
+    db.commit()
+    db.refresh(processing_job)
+
+    preview_video_task.delay(
+        video.id,
+        processing_job.id,
+        req.auto_captions,
+        req.preview_seconds,
+        req.preview_scenes,
+        req.scene_engine.value if req.scene_engine else None
+    )
     return {"job_id": processing_job.id}
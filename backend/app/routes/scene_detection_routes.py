@@ -1,25 +1,71 @@
 # backend/app/routes/scene_detection_routes.py
 
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
+from typing import Optional
 from app.database import get_db  # Updated import
-from app.models import Video
-from app.services.scene_detection import detect_scenes
+from app.models import Video, ProcessingJob, JobStatus, JobType
+from app.services.scene_detection import load_stored_scenes
+from app.utils.scene_detectors import SceneEngine, scene_detector_key
+from app.services.video_processing import detect_scenes_task
 
 router = APIRouter()
 
 @router.post("/detect_scenes/{video_id}", summary="Detect Scenes in a Video")
-async def detect_scenes_endpoint(video_id: int, db: Session = Depends(get_db)):
+async def detect_scenes_endpoint(video_id: int, engine: Optional[SceneEngine] = None, db: Session = Depends(get_db)):
     """
     Endpoint to detect scenes in a video.
 
+    Returns the stored scenes if this engine has already run on the video; otherwise
+    starts detection in the background and returns 202 with its job. While a detection
+    of the video with the same engine is pending or running, no second one is started and
+    that job is returned.
+
     - **video_id**: ID of the video to analyze.
+    - **engine**: Scene detection engine; defaults to the configured one.
     """
     video = db.query(Video).filter(Video.id == video_id).first()
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
-    
-    scene_timestamps = detect_scenes(video_id, video.upload_path, db)
-    
-    return {"scenes": scene_timestamps}
 
+    engine_value = engine.value if engine else None
+    detector_key = scene_detector_key(engine_value)
+    rows = load_stored_scenes(db, video_id, detector_key)
+    if rows:
+        return {"scenes": [(row.start_time, row.end_time) for row in rows]}
+
+    job = db.query(ProcessingJob).filter(
+        ProcessingJob.video_id == video_id,
+        ProcessingJob.job_type == JobType.SCENE_DETECTION,
+        ProcessingJob.detector_key == detector_key,
+        ProcessingJob.status.in_([JobStatus.PENDING, JobStatus.IN_PROGRESS])
+    ).first()
+    if not job:
+        job = ProcessingJob(
+            video_id=video_id,
+            status=JobStatus.PENDING,
+            progress=0.0,
+            job_type=JobType.SCENE_DETECTION,
+            detector_key=detector_key
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        detect_scenes_task.delay(video_id, job.id, engine_value)
+
+    return JSONResponse(status_code=202, content={"status": "pending", "job_id": job.id})
+
+@router.get("/scenes/{video_id}", summary="Get Detected Scenes of a Video")
+async def get_scenes_endpoint(video_id: int, engine: Optional[SceneEngine] = None, db: Session = Depends(get_db)):
+    """
+    Endpoint to get the stored scenes of a video.
+
+    - **video_id**: ID of the video.
+    - **engine**: Scene detection engine; defaults to the configured one.
+    """
+    rows = load_stored_scenes(db, video_id, scene_detector_key(engine.value if engine else None))
+    if not rows:
+        raise HTTPException(status_code=404, detail="No scenes detected for this video")
+
+    return {"scenes": [(row.start_time, row.end_time) for row in rows]}
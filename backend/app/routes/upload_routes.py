@@ -13,6 +13,7 @@ from app.database import get_db
 from app.models import Video, ProcessingJob, VideoStatus, JobStatus, JobType
 from app.services.video_processing import process_video_task
 from app.utils.video_utils import get_frame_at_time
+from app.utils.encoding import EncodingProfile, video_encoder_args
 from PIL import Image
 
 # NEW IMPORTS for S3
@@ -40,9 +41,13 @@ def run_ffprobe(video_path: str, label: str = ""):
     except Exception as e:
         logger.error(f"Error running ffprobe {label} on {video_path}: {e}", exc_info=True)
 
-def convert_to_cfr(input_path: str) -> str:
+def convert_to_cfr(input_path: str, profile: str = EncodingProfile.STANDARD) -> str:
     """
-    Convert the uploaded video to a constant frame rate (CFR) version.
+    Convert the uploaded video to a constant frame rate (CFR) version,
+    encoded with the given encoding profile.
+
+    The CFR file is the master every render decodes, so it keeps the STANDARD profile
+    whatever the plan; plan profiles only apply to the final outputs.
     """
     base, ext = os.path.splitext(input_path)
     cfr_path = base + "_cfr.mp4"
@@ -51,10 +56,10 @@ def convert_to_cfr(input_path: str) -> str:
     cmd = [
         "ffmpeg", "-y", "-i", input_path,
         "-r", desired_fps,
-        "-pix_fmt", "yuv420p",
+        *video_encoder_args(profile),
         cfr_path
     ]
-    logger.info(f"Running ffmpeg to convert {input_path} to CFR at {desired_fps} fps.")
+    logger.info(f"Running ffmpeg to convert {input_path} to CFR at {desired_fps} fps with the {EncodingProfile(profile).value} profile.")
     result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
     if result.returncode != 0:
         logger.error(f"ffmpeg CFR conversion failed: {result.stderr}")
@@ -5,13 +5,21 @@ import json
 import logging
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
+from app.config import settings
 from app.models import Speaker
-from app.utils.video_utils import extract_frames, generate_thumbnail
+from app.utils.video_utils import iter_frames, generate_thumbnail
+from app.utils.face_inference import analyze_frames, batched_detection_matches, PROMINENT_FACE_RATIO
+from app.utils.inference_pool import InferenceSessionPool
+from app.utils.model_registry import insightface_root, timed_load
 import cv2
 import numpy as np
 from collections import defaultdict
 import pickle
+import onnxruntime
 from insightface.app import FaceAnalysis
+from insightface.model_zoo.arcface_onnx import ArcFaceONNX
+from insightface.model_zoo.retinaface import RetinaFace
+from insightface.utils import ensure_available
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 import hdbscan
@@ -20,33 +28,76 @@ logger = logging.getLogger(__name__)
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Global variables for face detection
-face_detector = None
+# Pool of face analysis sessions shared by the worker's task threads
+face_detector_pool = None
 
 # scaler and pca are used for embedding normalization and dimensionality reduction
 scaler = None
 pca = None
 
-def load_face_detector():
-    global face_detector
-    if face_detector is not None:
-        return face_detector
+# The buffalo_l models used, by task; its landmark and gender/age models are never loaded
+BUFFALO_L_MODELS = {
+    'detection': ('det_10g.onnx', RetinaFace),
+    'recognition': ('w600k_r50.onnx', ArcFaceONNX),
+}
+
+class PooledFaceAnalysis(FaceAnalysis):
+    """
+    FaceAnalysis whose onnxruntime sessions are created with our own SessionOptions.
 
+    InsightFace's model loader only forwards providers to onnxruntime, so thread limits
+    never reach the sessions it creates; here the sessions are built first and handed
+    to the model classes. prepare() and get() are FaceAnalysis's own.
+    """
+
+    def __init__(self, name: str, root: str, session_options, providers: list):
+        model_dir = ensure_available('models', name, root=root)
+        self.models = {}
+        for taskname, (filename, model_cls) in BUFFALO_L_MODELS.items():
+            model_file = os.path.join(model_dir, filename)
+            session = onnxruntime.InferenceSession(model_file, sess_options=session_options, providers=providers)
+            self.models[taskname] = model_cls(model_file=model_file, session=session)
+        self.det_model = self.models['detection']
+
+def _create_face_detector(session_options):
     try:
         logger.info("Loading buffalo_l face detector from InsightFace...")
-        face_detector = FaceAnalysis(
-            name='buffalo_l',
-            providers=['CPUExecutionProvider'],
-            allowed_modules=['detection', 'recognition']
-        )
-        # Lower detection threshold and increase detection size
-        face_detector.prepare(ctx_id=0, det_thresh=0.5, det_size=(640,640))
-        logger.info("buffalo_l face pipeline loaded successfully.")
+        with timed_load('buffalo_l'):
+            face_detector = PooledFaceAnalysis(
+                name='buffalo_l',
+                root=insightface_root(),
+                session_options=session_options,
+                providers=['CPUExecutionProvider']
+            )
+            # Lower detection threshold and increase detection size
+            face_detector.prepare(ctx_id=0, det_thresh=0.5, det_size=(640,640))
+        # Batched detection decodes the raw outputs itself, so it is only trusted once it
+        # agrees with InsightFace's own pipeline
+        face_detector.batched_detection = batched_detection_matches(face_detector)
+        logger.info(f"buffalo_l face pipeline loaded successfully "
+                    f"(batched detection {'on' if face_detector.batched_detection else 'off'}).")
         return face_detector
     except Exception as e:
         logger.error(f"Failed to load face detector: {e}", exc_info=True)
         raise e
 
+def get_face_detector_pool() -> InferenceSessionPool:
+    """
+    The process-wide pool of buffalo_l FaceAnalysis instances.
+
+    Celery runs tasks in threads, and one FaceAnalysis per concurrent task with its share
+    of the cores keeps onnxruntime from oversubscribing them. Check one out with
+    `acquire`/`release` or `with get_face_detector_pool().checkout() as face_detector:`.
+    """
+    global face_detector_pool
+    if face_detector_pool is None:
+        face_detector_pool = InferenceSessionPool(
+            _create_face_detector,
+            settings.FACE_SESSION_POOL_SIZE or settings.WORKER_CONCURRENCY,
+            name="buffalo_l"
+        )
+    return face_detector_pool
+
 def visualize_embeddings(embeddings, labels, output_path='embeddings_tsne.png'):
     """
     Generates a t-SNE visualization of the face embeddings.
@@ -106,92 +157,127 @@ def merge_clusters(X, labels, distance_threshold=0.5):
                 logger.debug(f"Merging cluster {label2} into cluster {label1}")
     return merged_labels
 
+class FaceSampler:
+    """
+    Decode-pass consumer that collects face embeddings from every `frame_skip`-th frame.
+
+    It can be fed by its own decode (see detect_unique_people) or share a single decode
+    with scene detection and rendering; `finalize()` clusters the collected faces.
+    Sampled frames are queued and analysed `batch_size` at a time (see analyze_frames).
+    """
+
+    def __init__(self, frame_skip: int = 25, detector=None, batch_size: int = None):
+        self.frame_skip = max(1, frame_skip)
+        self.detector = detector
+        self.batch_size = batch_size or settings.FACE_BATCH_SIZE
+        self.pending_frames = []  # Sampled frames waiting for the next batched inference
+        self.embeddings = []
+        self.face_images = []
+        self.face_tracking = []  # Faces kept per sampled frame
+        self.num_frames = 0
+
+    def __call__(self, frame_idx: int, frame: np.ndarray):
+        if frame_idx % self.frame_skip == 0:
+            self.add_frame(frame)
+
+    def add_frame(self, frame: np.ndarray):
+        """Queue one sampled frame; faces are analysed a batch of frames at a time."""
+        self.pending_frames.append(frame)
+        if len(self.pending_frames) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Detect and embed the faces of all queued frames in batched inferences."""
+        if not self.pending_frames:
+            return
+        frames, self.pending_frames = self.pending_frames, []
+
+        if self.detector is not None:
+            faces_per_frame = analyze_frames(
+                self.detector, frames, self.batch_size, min_face_ratio=PROMINENT_FACE_RATIO
+            )
+        else:
+            # Without a detector of its own, the sampler only holds a session per batch
+            with get_face_detector_pool().checkout() as detector:
+                faces_per_frame = analyze_frames(
+                    detector, frames, self.batch_size, min_face_ratio=PROMINENT_FACE_RATIO
+                )
+
+        for frame, faces in zip(frames, faces_per_frame):
+            self.num_frames += 1
+            self._keep_faces(self.num_frames, frame, faces)
+
+    def _keep_faces(self, idx: int, frame: np.ndarray, faces: list):
+        """Keep the embeddings and crops of the faces that survived the size filter."""
+        embeddings = self.embeddings
+        face_images = self.face_images
+        logger.info(f"Frame {idx}: Kept {len(faces)} prominent faces")
+
+        frame_faces = []
+
+        for face_idx, face in enumerate(faces):
+            try:
+                bbox = face.bbox.astype(int)
+                x1, y1, x2, y2 = bbox
+                face_size = (x2 - x1) * (y2 - y1)
+
+                # Add padding around face
+                padding = int(min(face_size, face_size) * 0.2)
+                x1 = max(0, x1 - padding)
+                y1 = max(0, y1 - padding)
+                x2 = min(frame.shape[1], x2 + padding)
+                y2 = min(frame.shape[0], y2 + padding)
+
+                # Extract face region directly
+                face_img = frame[y1:y2, x1:x2]
+
+                # Resize to a standard size
+                face_img = cv2.resize(face_img, (112, 112))
+
+                # Get embedding directly from the detector
+                if hasattr(face, 'embedding') and face.embedding is not None:
+                    embeddings.append(face.embedding)
+                    face_images.append(face_img)
+                    frame_faces.append(face)
+                    logger.info(f"Frame {idx}: Successfully processed face {face_idx}")
+                else:
+                    logger.warning(f"Frame {idx}: No embedding available for face {face_idx}")
+
+            except Exception as e:
+                logger.error(f"Error processing face {face_idx} in frame {idx}: {e}")
+                continue
+
+        self.face_tracking.append(frame_faces)
+
+    def finalize(self):
+        self.flush()
+        logger.info(f"Sampled {self.num_frames} frames from the video.")
+        if self.num_frames == 0:
+            logger.warning("No frames extracted. Returning 0 unique people.")
+            return 0, None, None, None
+
+        if not self.embeddings:
+            logger.warning("No face embeddings extracted. Possibly no faces detected.")
+            return 0, None, None, None
+
+        return cluster_face_samples(self.embeddings, self.face_images, self.face_tracking, self.num_frames)
+
 def detect_unique_people(file_path: str, frame_skip: int = 25):
-    global scaler, pca
-    
     logger.info(f"detect_unique_people called with {file_path}, frame_skip={frame_skip}")
     from app.utils.video_utils import ffprobe_info
     ffprobe_info(file_path, label="face_detection start")
 
     logger.info(f"Starting face-based person detection for file {file_path} with frame_skip={frame_skip}.")
-    frames = extract_frames(file_path, frame_skip=frame_skip)
-    logger.info(f"Extracted {len(frames)} frames from the video.")
-
-    if not frames:
-        logger.warning("No frames extracted. Returning 0 unique people.")
-        return 0, None, None, None
-
-    detector = load_face_detector()
-    embeddings = []
-    face_images = []
-    face_tracking = []  # Add this line to track faces per frame
-
-    for idx, frame in enumerate(frames, start=1):
-        try:
-            faces = detector.get(frame)
-            logger.info(f"Frame {idx}: Found {len(faces)} faces")
-            
-            # Calculate face sizes and determine threshold
-            if faces:
-                face_sizes = [(i, (face.bbox[2]-face.bbox[0]) * (face.bbox[3]-face.bbox[1])) 
-                             for i, face in enumerate(faces)]
-                face_sizes.sort(key=lambda x: x[1], reverse=True)
-                
-                # Use largest face as reference
-                largest_face_size = face_sizes[0][1]
-                # Set threshold at 20% of largest face size
-                size_threshold = largest_face_size * 0.2
-                
-                logger.info(f"Frame {idx}: Largest face size: {largest_face_size}, threshold: {size_threshold}")
-            
-            frame_faces = []
-            
-            for face_idx, face in enumerate(faces):
-                try:
-                    bbox = face.bbox.astype(int)
-                    x1, y1, x2, y2 = bbox
-                    face_size = (x2 - x1) * (y2 - y1)
-
-                    if face_size < size_threshold:
-                        logger.warning(f"Frame {idx}: Skipping small face {face_idx}: {x2-x1}x{y2-y1} (area: {face_size} < threshold: {size_threshold})")
-                        continue
 
-                    # Add padding around face
-                    padding = int(min(face_size, face_size) * 0.2)
-                    x1 = max(0, x1 - padding)
-                    y1 = max(0, y1 - padding)
-                    x2 = min(frame.shape[1], x2 + padding)
-                    y2 = min(frame.shape[0], y2 + padding)
+    # Stream sampled frames so only the decode look-ahead is ever held in memory
+    sampler = FaceSampler(frame_skip=frame_skip)
+    for _, frame in iter_frames(file_path, frame_skip=frame_skip):
+        sampler.add_frame(frame)
+    return sampler.finalize()
 
-                    # Extract face region directly
-                    face_img = frame[y1:y2, x1:x2]
-                    
-                    # Resize to a standard size
-                    face_img = cv2.resize(face_img, (112, 112))
-
-                    # Get embedding directly from the detector
-                    if hasattr(face, 'embedding') and face.embedding is not None:
-                        embedding = face.embedding
-                        embeddings.append(embedding)
-                        face_images.append(face_img)
-                        frame_faces.append(face)  # Add this line
-                        logger.info(f"Frame {idx}: Successfully processed face {face_idx}")
-                    else:
-                        logger.warning(f"Frame {idx}: No embedding available for face {face_idx}")
-
-                except Exception as e:
-                    logger.error(f"Error processing face {face_idx} in frame {idx}: {e}")
-                    continue
-            
-            face_tracking.append(frame_faces)  # Add this line
-
-        except Exception as e:
-            logger.error(f"Error processing frame {idx}: {e}")
-            continue
-
-    if not embeddings:
-        logger.warning("No face embeddings extracted. Possibly no faces detected.")
-        return 0, None, None, None
+def cluster_face_samples(embeddings: list, face_images: list, face_tracking: list, num_frames: int):
+    """Cluster sampled face embeddings into unique people."""
+    global scaler, pca
 
     # Convert embeddings to numpy array
     embeddings = np.array(embeddings)
@@ -214,7 +300,7 @@ def detect_unique_people(file_path: str, frame_skip: int = 25):
     X_reduced = pca.fit_transform(X_scaled)
 
     # Add temporal information to feature space with reduced weight
-    frame_info = np.array(frame_indices).reshape(-1, 1) / len(frames)
+    frame_info = np.array(frame_indices).reshape(-1, 1) / num_frames
     X_with_temporal = np.hstack([X_reduced * 0.9, frame_info * 0.1])  # Reduce temporal weight even further
 
     # Initial clustering
@@ -318,6 +404,64 @@ def detect_unique_people(file_path: str, frame_skip: int = 25):
 
     return num_unique_people, final_labels, X_reduced, face_images
 
+def store_detected_speakers(video_id: int, detection_result: tuple, db: Session):
+    """
+    Persist the output of detect_unique_people / FaceSampler.finalize as Speaker rows.
+
+    Args:
+        video_id (int): ID of the video in the database.
+        detection_result (tuple): (num_people, labels, processed_embeddings, face_images).
+        db (Session): SQLAlchemy database session.
+    """
+    num_people, labels, processed_embeddings, face_images = detection_result
+    logger.info(f"For video_id={video_id}, detected {num_people} unique individuals via face recognition.")
+
+    if labels is not None and num_people > 0:
+        # Save scaler and PCA for this video
+        models_dir = os.path.join("app", "models", str(video_id))
+        os.makedirs(models_dir, exist_ok=True)
+
+        with open(os.path.join(models_dir, 'scaler.pkl'), 'wb') as f:
+            pickle.dump(scaler, f)
+        with open(os.path.join(models_dir, 'pca.pkl'), 'wb') as f:
+            pickle.dump(pca, f)
+
+        logger.info(f"Saved scaler and PCA models for video_id={video_id}")
+
+        # Exclude noise labels (-1)
+        valid_indices = [i for i, label in enumerate(labels) if label != -1]
+        unique_labels = set(label for label in labels if label != -1)
+        logger.info(f"Valid clusters after excluding noise: {unique_labels}")
+
+        label_to_indices = defaultdict(list)
+        for idx in valid_indices:
+            label_to_indices[labels[idx]].append(idx)
+
+        # Store the transformed embeddings
+        for label in unique_labels:
+            indices = label_to_indices[label]
+            representative_idx = indices[0]
+
+            # Get the raw embedding and transform it
+            raw_embedding = processed_embeddings[representative_idx]  # This is already transformed
+
+            representative_image = face_images[representative_idx]
+            thumbnail_path = generate_thumbnail(representative_image, video_id, speaker_id=label)
+
+            # Store the transformed embedding
+            speaker = Speaker(
+                video_id=video_id,
+                unique_speaker_id=int(label),
+                embedding=json.dumps(raw_embedding.tolist()),  # Store the already transformed embedding
+                thumbnail_path=thumbnail_path
+            )
+            db.add(speaker)
+
+        db.commit()
+        logger.info(f"Stored {len(unique_labels)} speakers in the database for video_id={video_id}.")
+    else:
+        logger.warning(f"No valid labels found for video_id={video_id}.")
+
 def detect_and_store_speakers(video_id: int, file_path: str, db: Session, frame_skip: int = 25):
     """
     Detects and stores unique speakers from a video file.
@@ -329,54 +473,8 @@ def detect_and_store_speakers(video_id: int, file_path: str, db: Session, frame_
         frame_skip (int, optional): Number of frames to skip between detections. Defaults to 25.
     """
     try:
-        num_people, labels, processed_embeddings, face_images = detect_unique_people(file_path, frame_skip=frame_skip)
-        logger.info(f"For video_id={video_id}, detected {num_people} unique individuals via face recognition.")
-
-        if labels is not None and num_people > 0:
-            # Save scaler and PCA for this video
-            models_dir = os.path.join("app", "models", str(video_id))
-            os.makedirs(models_dir, exist_ok=True)
-            
-            with open(os.path.join(models_dir, 'scaler.pkl'), 'wb') as f:
-                pickle.dump(scaler, f)
-            with open(os.path.join(models_dir, 'pca.pkl'), 'wb') as f:
-                pickle.dump(pca, f)
-            
-            logger.info(f"Saved scaler and PCA models for video_id={video_id}")
-
-            # Exclude noise labels (-1)
-            valid_indices = [i for i, label in enumerate(labels) if label != -1]
-            unique_labels = set(label for label in labels if label != -1)
-            logger.info(f"Valid clusters after excluding noise: {unique_labels}")
-
-            label_to_indices = defaultdict(list)
-            for idx in valid_indices:
-                label_to_indices[labels[idx]].append(idx)
-
-            # Store the transformed embeddings
-            for label in unique_labels:
-                indices = label_to_indices[label]
-                representative_idx = indices[0]
-                
-                # Get the raw embedding and transform it
-                raw_embedding = processed_embeddings[representative_idx]  # This is already transformed
-                
-                representative_image = face_images[representative_idx]
-                thumbnail_path = generate_thumbnail(representative_image, video_id, speaker_id=label)
-                
-                # Store the transformed embedding
-                speaker = Speaker(
-                    video_id=video_id,
-                    unique_speaker_id=int(label),
-                    embedding=json.dumps(raw_embedding.tolist()),  # Store the already transformed embedding
-                    thumbnail_path=thumbnail_path
-                )
-                db.add(speaker)
-
-            db.commit()
-            logger.info(f"Stored {len(unique_labels)} speakers in the database for video_id={video_id}.")
-        else:
-            logger.warning(f"No valid labels found for video_id={video_id}.")
+        detection_result = detect_unique_people(file_path, frame_skip=frame_skip)
+        store_detected_speakers(video_id, detection_result, db)
 
     except Exception as e:
         logger.error(f"Error in detect_and_store_speakers for video ID {video_id}: {e}", exc_info=True)
@@ -0,0 +1,326 @@
+# backend/app/services/rendering.py
+
+import enum
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import settings
+from app.utils.encoding import EncodingProfile, video_encoder_args
+from app.utils.video_utils import (
+    compute_fit_transform,
+    scene_frame_ranges,
+    render_frame_range,
+    audio_codec_args,
+    probe_audio_codec,
+    subtitles_filter
+)
+
+logger = logging.getLogger(__name__)
+
+class RenderMode(str, enum.Enum):
+    # Decode in Python, render each frame with its scene's LayoutPlan, pipe into ffmpeg
+    FRAMES = "frames"
+    # Describe every scene as crop/scale/stack in one ffmpeg filter_complex
+    FILTERGRAPH = "filtergraph"
+    # Render timeline segments in a process pool and stream-copy concat them
+    PARALLEL = "parallel"
+    # Fan segments out to Celery workers as a chord and concat them in a reduce task
+    DISTRIBUTED = "distributed"
+
+def _region_filter(box: tuple, frame_w: int, frame_h: int, target_w: int, target_h: int) -> str:
+    """Filter chain that does what LayoutPlan does for one grid cell."""
+    # Boxes are clamped to the frame when identified (clamp_box), as LayoutPlan expects
+    x1, y1, x2, y2 = box
+    face_w = x2 - x1
+    face_h = y2 - y1
+    if face_w <= 0 or face_h <= 0:
+        return None
+    t = compute_fit_transform(box, face_w, face_h, frame_w, frame_h, target_w, target_h)
+    if t is None:
+        return None
+
+    cx, cy, cw, ch = t['crop']
+    new_w, new_h = t['scaled']
+    sx, sy, sw, sh = t['center_crop']
+    chain = [
+        f"crop={cw}:{ch}:{cx}:{cy}",
+        f"scale={new_w}:{new_h}:flags=bilinear",
+        f"crop={sw}:{sh}:{sx}:{sy}",
+    ]
+    if (sw, sh) != (target_w, target_h):
+        chain.append(f"scale={target_w}:{target_h}:flags=bilinear")
+    return ",".join(chain)
+
+def _scene_filter(idx: int, start_frame: int, end_frame: int, scene: dict,
+                  frame_w: int, frame_h: int) -> list:
+    """Filter lines that render one scene to the label [s{idx}]."""
+    layout = scene['layout_config']
+    out_w, out_h = layout['width'], layout['height']
+    grid = layout['grid']
+    trim = f"[0:v]trim=start_frame={start_frame}:end_frame={end_frame},setpts=PTS-STARTPTS"
+
+    cells = []
+    for i, (_, box) in enumerate(scene['identified'][:len(grid)]):
+        gx1, gy1, gx2, gy2 = grid[i]
+        chain = _region_filter(box, frame_w, frame_h, gx2 - gx1, gy2 - gy1)
+        if chain is None:
+            logger.warning(f"Scene {idx}: empty region for cell {i}, leaving it black")
+        cells.append((grid[i], chain))
+
+    # Scenes without usable faces render as a black canvas, as LayoutPlan does
+    if not any(chain for _, chain in cells):
+        return [f"{trim},scale={out_w}:{out_h},setsar=1,"
+                f"drawbox=x=0:y=0:w=iw:h=ih:color=black:t=fill[s{idx}]"]
+
+    lines = [f"{trim},split={len(cells)}" + "".join(f"[s{idx}in{i}]" for i in range(len(cells)))]
+    for i, ((gx1, gy1, gx2, gy2), chain) in enumerate(cells):
+        if chain is None:
+            chain = f"scale={gx2 - gx1}:{gy2 - gy1},drawbox=x=0:y=0:w=iw:h=ih:color=black:t=fill"
+        lines.append(f"[s{idx}in{i}]{chain},setsar=1[s{idx}c{i}]")
+
+    n = len(cells)
+    if n == 1:
+        lines.append(f"[s{idx}c0]null[s{idx}]")
+    elif n == 2:
+        lines.append(f"[s{idx}c0][s{idx}c1]vstack=inputs=2[s{idx}]")
+    elif n == 3:
+        lines.append(f"[s{idx}c0][s{idx}c1]hstack=inputs=2[s{idx}top]")
+        lines.append(f"[s{idx}top][s{idx}c2]vstack=inputs=2[s{idx}]")
+    else:
+        lines.append(f"[s{idx}c0][s{idx}c1]hstack=inputs=2[s{idx}top]")
+        lines.append(f"[s{idx}c2][s{idx}c3]hstack=inputs=2[s{idx}bottom]")
+        lines.append(f"[s{idx}top][s{idx}bottom]vstack=inputs=2[s{idx}]")
+    return lines
+
+def _output_scale(output_size: tuple) -> str:
+    return f"scale={output_size[0]}:{output_size[1]}:flags=fast_bilinear," if output_size else ""
+
+def build_layout_filtergraph(scenes: list, total_frames: int, frame_w: int, frame_h: int,
+                             subtitles: str = None, output_size: tuple = None) -> str:
+    """
+    Turn the per-scene layout decisions into one filter_complex ending in [vout].
+
+    Each scene is trimmed by frame number, cropped/scaled per grid cell with the same
+    geometry as LayoutPlan, stacked, and all scenes are concatenated. Captions
+    from the .ass file `subtitles` are burned into the concatenated stream, which is
+    scaled down to `output_size` (width, height) if given.
+    """
+    ranges = scene_frame_ranges(scenes, total_frames)
+    if not ranges:
+        raise ValueError("No scenes to render.")
+
+    lines = []
+    for idx, (start_frame, end_frame, scene) in enumerate(ranges):
+        lines.extend(_scene_filter(idx, start_frame, end_frame, scene, frame_w, frame_h))
+    labels = "".join(f"[s{idx}]" for idx in range(len(ranges)))
+    captions = f"{subtitles_filter(subtitles)}," if subtitles else ""
+    lines.append(f"{labels}concat=n={len(ranges)}:v=1:a=0,{captions}{_output_scale(output_size)}format=yuv420p[vout]")
+    return ";\n".join(lines)
+
+def sample_scene_ranges(scenes: list, total_frames: int, num_scenes: int, max_frames: int) -> list:
+    """
+    Pick `num_scenes` scenes spread evenly over the video and keep at most `max_frames`
+    from the start of each, as (start, end, scene) ranges.
+    """
+    ranges = scene_frame_ranges(scenes, total_frames)
+    if num_scenes < len(ranges):
+        step = len(ranges) / num_scenes
+        ranges = [ranges[int(i * step)] for i in range(num_scenes)]
+    return [(start, min(end, start + max_frames), scene) for start, end, scene in ranges]
+
+def build_sampled_filtergraph(ranges: list, fps: float, frame_w: int, frame_h: int, subtitles: str = None,
+                              output_size: tuple = None, with_audio: bool = True) -> str:
+    """
+    Like build_layout_filtergraph, but for disjoint (start, end, scene) ranges joined into
+    [vout] and, with `with_audio`, [aout]. Each range keeps its own stretch of source
+    audio and of captions.
+    """
+    if not ranges:
+        raise ValueError("No scenes to render.")
+
+    lines = []
+    concat_inputs = ""
+    for idx, (start_frame, end_frame, scene) in enumerate(ranges):
+        lines.extend(_scene_filter(idx, start_frame, end_frame, scene, frame_w, frame_h))
+        if subtitles:
+            lines.append(f"[s{idx}]{subtitles_filter(subtitles, start_frame / fps)}[s{idx}cap]")
+            concat_inputs += f"[s{idx}cap]"
+        else:
+            concat_inputs += f"[s{idx}]"
+        if with_audio:
+            lines.append(f"[0:a]atrim=start={start_frame / fps:.6f}:end={end_frame / fps:.6f},"
+                         f"asetpts=PTS-STARTPTS[a{idx}]")
+            concat_inputs += f"[a{idx}]"
+
+    audio_outputs = 1 if with_audio else 0
+    audio_label = "[aout]" if with_audio else ""
+    lines.append(f"{concat_inputs}concat=n={len(ranges)}:v=1:a={audio_outputs}[vcat]{audio_label}")
+    lines.append(f"[vcat]{_output_scale(output_size)}format=yuv420p[vout]")
+    return ";\n".join(lines)
+
+def _run_filtergraph(input_path: str, output_path: str, filtergraph: str, output_args: list):
+    """Run ffmpeg on `input_path` with `filtergraph` passed as a script file."""
+    # The graph grows with the scene count, so pass it as a script instead of an argument
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.write(filtergraph)
+        script_path = f.name
+
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-i", input_path,
+        "-filter_complex_script", script_path,
+        *output_args,
+        output_path
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    finally:
+        os.remove(script_path)
+    if result.returncode != 0:
+        logger.error(f"ffmpeg filtergraph render failed: {result.stderr}")
+        raise RuntimeError("Failed to render video via ffmpeg filtergraph.")
+
+def render_with_filtergraph(input_path: str, output_path: str, scenes: list, total_frames: int,
+                            frame_w: int, frame_h: int, profile: str = EncodingProfile.STANDARD,
+                            subtitles: str = None, output_size: tuple = None) -> str:
+    """
+    Render the whole video inside ffmpeg from the scene layout decisions.
+
+    No frame passes through Python; ffmpeg decodes, crops, scales, stacks and encodes
+    in its own threads and muxes the source audio into the same output.
+    """
+    filtergraph = build_layout_filtergraph(scenes, total_frames, frame_w, frame_h, subtitles, output_size)
+    output_args = [
+        "-map", "[vout]", "-map", "0:a:0?",
+        *video_encoder_args(profile),
+        *audio_codec_args(input_path),
+    ]
+    logger.info(f"Rendering {input_path} => {output_path} with an ffmpeg filtergraph ({len(scenes)} scenes)")
+    _run_filtergraph(input_path, output_path, filtergraph, output_args)
+
+    logger.info(f"Filtergraph render complete: {output_path}")
+    return output_path
+
+def render_sampled_scenes(input_path: str, output_path: str, ranges: list, fps: float, frame_w: int,
+                          frame_h: int, profile: str = EncodingProfile.STANDARD, subtitles: str = None,
+                          output_size: tuple = None) -> str:
+    """Render the (start, end, scene) `ranges` back to back with their audio and captions."""
+    with_audio = probe_audio_codec(input_path) is not None
+    filtergraph = build_sampled_filtergraph(ranges, fps, frame_w, frame_h, subtitles, output_size, with_audio)
+    output_args = ["-map", "[vout]", *video_encoder_args(profile)]
+    if with_audio:
+        # Trimmed audio is filtered, so it cannot be stream-copied
+        output_args += ["-map", "[aout]", "-c:a", "aac"]
+    logger.info(f"Rendering {len(ranges)} sampled scenes of {input_path} => {output_path}")
+    _run_filtergraph(input_path, output_path, filtergraph, output_args)
+    return output_path
+
+def plan_segments(scenes: list, total_frames: int, num_segments: int) -> list:
+    """
+    Split [0, total_frames) into about `num_segments` contiguous (start, end) frame ranges.
+
+    Cuts land on scene boundaries where possible. A stretch with no boundary for more
+    than 1.5x the target length is cut inside the scene, which is safe because a scene's
+    layout does not change from frame to frame.
+    """
+    target = max(1, -(-total_frames // max(1, num_segments)))
+    boundaries = [start for start, _, _ in scene_frame_ranges(scenes, total_frames) if start > 0]
+
+    segments = []
+    seg_start = 0
+    for boundary in boundaries + [total_frames]:
+        while boundary - seg_start > target * 1.5:
+            segments.append((seg_start, seg_start + target))
+            seg_start += target
+        if boundary > seg_start and boundary - seg_start >= target // 2:
+            segments.append((seg_start, boundary))
+            seg_start = boundary
+
+    # Fold a short tail into the previous segment
+    if seg_start < total_frames:
+        if segments:
+            segments[-1] = (segments[-1][0], total_frames)
+        else:
+            segments.append((seg_start, total_frames))
+    return segments
+
+def scenes_in_range(scenes: list, start_frame: int, end_frame: int) -> list:
+    """The scene dicts that cover any frame of [start_frame, end_frame)."""
+    selected = []
+    for i, scene in enumerate(scenes):
+        next_start = scenes[i + 1]['start_frame'] if i + 1 < len(scenes) else None
+        if scene['start_frame'] < end_frame and (next_start is None or next_start > start_frame):
+            selected.append(scene)
+    return selected
+
+def concat_segments(segment_paths: list, output_path: str, audio_source: str = None) -> str:
+    """
+    Join encoded segments with the ffmpeg concat demuxer without re-encoding the video.
+    """
+    list_dir = os.path.dirname(segment_paths[0])
+    list_path = os.path.join(list_dir, "segments.txt")
+    with open(list_path, 'w') as f:
+        for path in segment_paths:
+            f.write(f"file '{path}'\n")
+
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_source:
+        cmd += ["-i", audio_source, "-map", "0:v:0", "-map", "1:a:0?", "-c:v", "copy",
+                *audio_codec_args(audio_source), "-shortest"]
+    else:
+        cmd += ["-c", "copy"]
+    cmd.append(output_path)
+
+    logger.info(f"Concatenating {len(segment_paths)} segments into {output_path}")
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    os.remove(list_path)
+    if result.returncode != 0:
+        logger.error(f"ffmpeg concat failed: {result.stderr}")
+        raise RuntimeError("Failed to concatenate rendered segments via ffmpeg.")
+    return output_path
+
+def render_scenes_parallel(input_path: str, output_path: str, scenes: list, total_frames: int,
+                           fps: float, max_workers: int = None, on_segment_done=None,
+                           profile: str = EncodingProfile.STANDARD, subtitles: str = None) -> str:
+    """
+    Render the timeline as independent segments in a process pool, then stream-copy them
+    together and mux the source audio. Each segment burns in its own share of the
+    captions of `subtitles`.
+
+    `on_segment_done(done, total)` is called in the parent as segments finish.
+    """
+    max_workers = max_workers or settings.RENDER_WORKERS or os.cpu_count() or 1
+    segments = plan_segments(scenes, total_frames, max_workers)
+    if not segments:
+        raise ValueError("No scenes to render.")
+
+    # Leave the encoder enough threads to use the cores the pool does not
+    encoder_threads = max(1, (os.cpu_count() or 1) // min(max_workers, len(segments)))
+    segment_dir = tempfile.mkdtemp(prefix="segments_")
+    logger.info(f"Rendering {len(segments)} segments with {max_workers} workers, "
+                f"{encoder_threads} encoder threads each")
+    try:
+        # spawn, not fork: the Celery worker is multi-threaded
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx) as pool:
+            futures = []
+            for i, (start_frame, end_frame) in enumerate(segments):
+                segment_path = os.path.join(segment_dir, f"segment_{i:05d}.mp4")
+                futures.append(pool.submit(
+                    render_frame_range, input_path, segment_path, scenes,
+                    start_frame, end_frame, fps, encoder_threads, profile, subtitles
+                ))
+            segment_paths = []
+            for done, future in enumerate(futures, start=1):
+                segment_paths.append(future.result())
+                if on_segment_done:
+                    on_segment_done(done, len(futures))
+
+        return concat_segments(segment_paths, output_path, audio_source=input_path)
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
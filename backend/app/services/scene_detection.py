@@ -1,71 +1,197 @@
 # backend/app/services/scene_detection.py
 
-import cv2
-import numpy as np
+import json
 import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from app.config import settings
+from app.models import Scene
+from app.utils.video_utils import iter_frames, get_video_properties
+# The engines live in app.utils so process-pool workers can load them without app.services
+from app.utils.scene_detectors import (
+    SceneEngine,
+    PRECOMPUTED_ENGINES,
+    create_scene_detector,
+    find_raw_cuts,
+    apply_min_scene_length,
+    scene_changes_to_scenes
+)
 
 logger = logging.getLogger(__name__)
 
-def detect_scenes(video_id: int, video_path: str, db: Session) -> list:
-    """Detect scene changes in a video and return list of (start_time, end_time) tuples"""
-    try:
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise IOError(f"Cannot open video file {video_path}")
+# Shortest time range worth handing to its own scene detection worker
+PARALLEL_MIN_RANGE_SECONDS = 30
 
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        logger.info(f"Video {video_path}: {total_frames} frames, {fps} FPS")
+def find_scene_changes_parallel(engine: str, video_path: str, fps: float, total_frames: int,
+                                workers: int) -> list:
+    """
+    Scene start frames found by `workers` processes, each scanning one time range.
 
-        # Parameters for scene detection
-        min_scene_length = int(fps * 1.0)  # Minimum 1 second per scene
-        threshold = 30.0  # Threshold for scene change detection
-        
-        prev_frame = None
-        scene_changes = [0]  # Start with first frame
-        frame_count = 0
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+    Workers only collect raw cuts; the minimum scene length depends on the previously kept
+    cut, which may lie in another range, so it is applied once over the merged cuts. That
+    is the same rule in the same order as a sequential pass, so the result matches it.
+    """
+    chunk = -(-total_frames // workers)
+    ranges = [(start, start + chunk) for start in range(0, total_frames, chunk)]
+    # The frame count is a container estimate; the last range reads whatever is left
+    ranges[-1] = (ranges[-1][0], None)
+
+    min_scene_length = create_scene_detector(engine, fps, video_path).min_scene_length
+    # spawn, not fork: the Celery worker is multi-threaded
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = [
+            pool.submit(find_raw_cuts, engine, video_path, fps, start_frame, end_frame)
+            for start_frame, end_frame in ranges
+        ]
+        raw_cuts = [cut for future in futures for cut in future.result()]
+    return apply_min_scene_length(raw_cuts, min_scene_length)
+
+def find_scene_changes(video_path: str, fps: float, total_frames: int, engine: str = None,
+                       workers: int = None) -> list:
+    """
+    Scene start frames of a local video, beginning with 0.
+
+    Frame-based engines scan the video in `workers` parallel time ranges
+    (settings.SCENE_DETECTION_WORKERS by default) once it is long enough to be worth it.
+    """
+    engine = SceneEngine(engine or settings.SCENE_DETECTION_ENGINE)
+    workers = workers or settings.SCENE_DETECTION_WORKERS or os.cpu_count() or 1
+    # Short ranges cost more in worker start-up than they save
+    workers = min(workers, total_frames // max(1, int(fps * PARALLEL_MIN_RANGE_SECONDS)))
+
+    if workers > 1 and engine not in PRECOMPUTED_ENGINES:
+        logger.info(f"Detecting scenes with {engine.value} in {workers} parallel ranges")
+        return find_scene_changes_parallel(engine, video_path, fps, total_frames, workers)
+
+    detector = create_scene_detector(engine, fps, video_path, rgb=False)
+    if detector.decodes_frames:
+        for frame_count, frame in iter_frames(video_path, rgb=False):
+            detector(frame_count, frame)
+    else:
+        # Replaying the cuts frame by frame applies the minimum scene length as usual
+        for frame_count in range(total_frames):
+            detector(frame_count, None)
+    return detector.scene_changes
+
+def detect_scenes(video_id: int, video_path: str, db: Session, engine: str = None, workers: int = None) -> list:
+    """
+    Detect scene changes in a local video and return list of (start_time, end_time) tuples.
+    """
+    total_frames = None
+    try:
+        props = get_video_properties(video_path)
+        fps = props['fps']
+        total_frames = props['frame_count']
+        logger.info(f"Video {video_path}: {total_frames} frames, {fps} FPS")
 
-            if prev_frame is not None:
-                # Convert to grayscale
-                curr_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                prev_gray = cv2.cvtColor(prev_frame, cv2.COLOR_BGR2GRAY)
-                
-                # Calculate frame difference
-                frame_diff = cv2.absdiff(curr_gray, prev_gray)
-                mean_diff = np.mean(frame_diff)
-                
-                # Detect scene change
-                if (mean_diff > threshold and 
-                    (frame_count - scene_changes[-1]) > min_scene_length):
-                    scene_changes.append(frame_count)
-                    logger.info(f"Scene change detected at frame {frame_count} "
-                              f"(time: {frame_count/fps:.2f}s)")
-
-            prev_frame = frame.copy()
-            frame_count += 1
-
-        # Add the final frame
-        scene_changes.append(total_frames)
-        
-        # Convert frame numbers to timestamps
-        scenes = []
-        for i in range(len(scene_changes) - 1):
-            start_time = scene_changes[i] / fps
-            end_time = scene_changes[i + 1] / fps
-            scenes.append((start_time, end_time))
-            
-        cap.release()
+        scene_changes = find_scene_changes(video_path, fps, total_frames, engine, workers)
+        scenes = scene_changes_to_scenes(scene_changes, total_frames, fps)
         logger.info(f"Detected {len(scenes)} scenes in video")
         return scenes
 
     except Exception as e:
         logger.error(f"Error in detect_scenes for video ID {video_id}: {e}")
-        cap.release()
-        return [(0, total_frames / fps)] if 'total_frames' in locals() else None
\ No newline at end of file
+        return [(0, total_frames / fps)] if total_frames is not None else None
+
+def load_stored_scenes(db: Session, video_id: int, detector_key: str) -> list:
+    """Stored Scene rows of a video for one detector, in timeline order."""
+    return (
+        db.query(Scene)
+        .filter(Scene.video_id == video_id, Scene.detector_key == detector_key)
+        .order_by(Scene.scene_index)
+        .all()
+    )
+
+def store_scenes(db: Session, video_id: int, detector_key: str, scene_changes: list, total_frames: int,
+                 fps: float, layouts: list = None) -> list:
+    """
+    Replace the stored scenes of a video for one detector.
+
+    `scene_changes` are scene start frames; `layouts`, if given, holds one
+    {'identified', 'layout_config'} dict per scene. Returns the new rows.
+    """
+    db.query(Scene).filter(Scene.video_id == video_id, Scene.detector_key == detector_key).delete()
+    rows = []
+    bounds = scene_changes + [total_frames]
+    for i in range(len(scene_changes)):
+        if bounds[i + 1] <= bounds[i]:
+            continue
+        layout = layouts[i] if layouts else None
+        rows.append(Scene(
+            video_id=video_id,
+            detector_key=detector_key,
+            scene_index=len(rows),
+            start_frame=bounds[i],
+            end_frame=bounds[i + 1],
+            start_time=bounds[i] / fps,
+            end_time=bounds[i + 1] / fps,
+            layout=json.dumps(layout) if layout else None
+        ))
+    db.add_all(rows)
+    db.commit()
+    logger.info(f"Stored {len(rows)} scenes for video ID {video_id} ({detector_key})")
+    return rows
+
+def _match_cuts(detected: list, expected: list, tolerance: int) -> int:
+    """Count detected cuts within `tolerance` frames of a distinct expected cut."""
+    unmatched = sorted(expected)
+    matched = 0
+    for cut in sorted(detected):
+        for i, label in enumerate(unmatched):
+            if abs(cut - label) <= tolerance:
+                del unmatched[i]
+                matched += 1
+                break
+    return matched
+
+def evaluate_scene_engine(engine: str, clips: list, tolerance_frames: int = 2) -> dict:
+    """
+    Run `engine` over labelled clips and report its speed and accuracy.
+
+    `clips` is a list of {'path': ..., 'cuts': [frame, ...]} with the frame numbers where a
+    new shot starts (frame 0 excluded). A detected cut counts as correct when it is within
+    `tolerance_frames` of a labelled one. Time includes whatever decoding the engine
+    does in a real job, and nothing more.
+    """
+    frames = 0
+    elapsed = 0.0
+    true_positives = 0
+    detected_total = 0
+    expected_total = 0
+
+    for clip in clips:
+        props = get_video_properties(clip['path'])
+        started = time.perf_counter()
+        detector = create_scene_detector(engine, props['fps'], clip['path'], rgb=False)
+        if detector.decodes_frames:
+            for frame_count, frame in iter_frames(clip['path'], rgb=False):
+                detector(frame_count, frame)
+                frames += 1
+        else:
+            # scdet and compressed do their own analysis; a Python decode would only add
+            # time the engine never spends in a real job
+            for frame_count in range(props['frame_count']):
+                detector(frame_count, None)
+                frames += 1
+        elapsed += time.perf_counter() - started
+
+        detected = detector.scene_changes[1:]
+        true_positives += _match_cuts(detected, clip['cuts'], tolerance_frames)
+        detected_total += len(detected)
+        expected_total += len(clip['cuts'])
+
+    precision = true_positives / detected_total if detected_total else 1.0
+    recall = true_positives / expected_total if expected_total else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        'engine': SceneEngine(engine).value,
+        'frames': frames,
+        'fps': frames / elapsed if elapsed else 0.0,
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+    }
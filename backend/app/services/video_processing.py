@@ -2,41 +2,67 @@
 
 import warnings
 import cv2
-from moviepy.editor import VideoFileClip
+from celery import chord
 from app.celery_app import celery
-from app.models import ProcessingJob, JobStatus, Speaker, VideoStatus, Video, JobType
+from app.config import settings
+from app.models import ProcessingJob, JobStatus, Speaker, VideoStatus, Video, JobType, Transcript
 from app.database import SessionLocal
-from app.services.face_detection import detect_and_store_speakers, load_face_detector
-from app.services.scene_detection import detect_scenes
-from app.utils.video_utils import extract_frames, apply_layout_to_frame, compile_video_with_audio, determine_layout, ffprobe_info
+from app.services.face_detection import detect_and_store_speakers, get_face_detector_pool, FaceSampler, store_detected_speakers
+from app.utils.face_inference import detect_faces
+from app.utils.asr import transcribe_segments, transcript_model_key
+from app.utils.file_utils import file_sha256
+from app.services.scene_detection import find_scene_changes, load_stored_scenes, store_scenes
+from app.utils.scene_detectors import SceneDetector, create_scene_detector, scene_detector_key
+from app.services.rendering import (
+    RenderMode,
+    render_with_filtergraph,
+    render_scenes_parallel,
+    plan_segments,
+    scenes_in_range,
+    concat_segments,
+    sample_scene_ranges,
+    render_sampled_scenes
+)
+from app.utils.encoding import EncodingProfile, resolve_encoding_profile
+from app.utils.video_utils import run_decode_pass, get_video_properties, ScenePlanCache, determine_layout, ffprobe_info, FFmpegFrameWriter, render_frame_range, cut_leading_clip, read_frames_at, extract_asr_audio, clamp_box, PREVIEW_WIDTH, PREVIEW_HEIGHT
 import logging
 import json
 import numpy as np
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from collections import defaultdict
 import pickle
 import os
+import shutil
 import subprocess
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 import uuid
-import whisper
 import datetime
-import re  
 
 # NEW IMPORTS for S3 handling
 from app.utils.s3_utils import (
     download_s3_to_local,
     upload_file_to_s3,
-    delete_local_file
+    delete_local_file,
+    delete_file_from_s3,
+    s3_url_for_key,
+    S3DownloadCache
 )
 
 ASS_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "my_subtitles.ass")
 
 import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# Transcriptions running alongside the analysis and render of their tasks
+caption_executor = ThreadPoolExecutor(max_workers=settings.WORKER_CONCURRENCY, thread_name_prefix="captions")
+
+# Segments of one render that land on the same worker share one download of the source
+segment_sources = S3DownloadCache(settings.SEGMENT_SOURCE_CACHE_SIZE)
+
 @celery.task(name="app.services.video_processing.detect_speakers_task")
 def detect_speakers_task(video_id: int, file_path: str, processing_job_id: int):
     logger.info(f"Starting detect_speakers_task for video_id={video_id}, job_id={processing_job_id}, file={file_path}")
@@ -70,16 +96,60 @@ def detect_speakers_task(video_id: int, file_path: str, processing_job_id: int):
         finally:
             db.close()
 
+@celery.task(name="app.services.video_processing.detect_scenes_task")
+def detect_scenes_task(video_id: int, job_id: int, scene_engine: str = None):
+    """Detect the scenes of a video once and store them; renders and routes read the rows."""
+    logger.info(f"Starting detect_scenes_task for video_id={video_id}, job_id={job_id}, scene_engine={scene_engine}")
+    with SessionLocal() as db:
+        local_temp_dir = tempfile.mkdtemp()
+        try:
+            job = db.query(ProcessingJob).filter(ProcessingJob.id == job_id).first()
+            if not job:
+                raise ValueError(f"No ProcessingJob found with ID: {job_id}")
+
+            job.status = JobStatus.IN_PROGRESS
+            db.commit()
+
+            local_cfr_path = os.path.join(local_temp_dir, "input_cfr.mp4")
+            download_s3_to_local(job.video.upload_path, local_cfr_path)
+
+            fps, total_frames = probe_fps_and_frames(local_cfr_path)
+            scene_changes = find_scene_changes(local_cfr_path, fps, total_frames, scene_engine)
+            store_scenes(db, video_id, scene_detector_key(scene_engine), scene_changes, total_frames, fps)
+
+            job.status = JobStatus.COMPLETED
+            job.progress = 100
+            db.commit()
+
+        except Exception as e:
+            logger.error(f"Error in detect_scenes_task for video ID {video_id}: {e}", exc_info=True)
+            # Scene detection failing says nothing about the video itself
+            mark_job_failed(db, job_id, fail_video=False)
+            raise e
+        finally:
+            shutil.rmtree(local_temp_dir, ignore_errors=True)
+            db.close()
+
 @celery.task(name="app.services.video_processing.process_video_task")
-def process_video_task(video_id: int, job_id: int, auto_captions: bool = False):
-    logger.info(f"Starting process_video_task for video_id={video_id}, job_id={job_id}, auto_captions={auto_captions}")
+def process_video_task(video_id: int, job_id: int, auto_captions: bool = False, detect_speakers: bool = False,
+                       render_mode: str = RenderMode.FRAMES.value, encoding_profile: str = None,
+                       scene_engine: str = None):
+    render_mode = RenderMode(render_mode)
+    logger.info(f"Starting process_video_task for video_id={video_id}, job_id={job_id}, auto_captions={auto_captions}, detect_speakers={detect_speakers}, render_mode={render_mode.value}, scene_engine={scene_engine}")
 
     with SessionLocal() as db:
+        local_temp_dir = tempfile.mkdtemp()
+        face_detector = None
+        captions_future = None
         try:
             job = db.query(ProcessingJob).filter(ProcessingJob.id == job_id).first()
             if not job:
                 raise ValueError(f"No ProcessingJob found with ID: {job_id}")
 
+            # Without an explicit profile, the owner's subscription plan decides
+            profile = resolve_encoding_profile(encoding_profile, job.video.owner.subscription_plan)
+            logger.info(f"Using encoding profile {profile.value}")
+
             # Mark job as IN_PROGRESS
             job.status = JobStatus.IN_PROGRESS
             job.video.status = VideoStatus.PROCESSING
@@ -90,194 +160,598 @@ def process_video_task(video_id: int, job_id: int, auto_captions: bool = False):
             logger.info(f"Will download S3 URL for video: {s3_url_cfr}")
 
             # 1. Download from S3 to local temp directory
-            local_temp_dir = tempfile.mkdtemp()
             local_cfr_path = os.path.join(local_temp_dir, "input_cfr.mp4")
             download_s3_to_local(s3_url_cfr, local_cfr_path)
             logger.info(f"Downloaded CFR video to {local_cfr_path}, proceeding with processing...")
 
             # 2. Gather fps info
-            def get_video_info(path: str):
-                cmd = [
-                    "ffprobe", "-v", "error", "-select_streams", "v:0", 
-                    "-show_entries", "stream=duration,nb_frames",
-                    "-of", "default=noprint_wrappers=1", path
-                ]
-                result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                duration = None
-                nb_frames = None
-                for line in result.stdout.splitlines():
-                    if line.startswith("duration="):
-                        duration = float(line.split('=')[1].strip())
-                    elif line.startswith("nb_frames="):
-                        nb_frames = float(line.split('=')[1].strip())
-                return duration, nb_frames
-
-            duration, nb_frames = get_video_info(local_cfr_path)
-            if duration is None or nb_frames is None:
-                logger.warning("Could not retrieve duration or nb_frames from ffprobe. Falling back to MoviePy fps.")
-                clip = VideoFileClip(local_cfr_path)
-                fps = clip.fps
-                clip.close()
-                logger.info(f"Using fps from MoviePy: {fps} FPS")
-            else:
-                fps = nb_frames / duration
-                logger.info(f"Calculated FPS from ffprobe: {fps:.4f}")
+            fps, total_frames = probe_fps_and_frames(local_cfr_path)
+
+            # The render keeps the source audio and timeline, so captions are transcribed
+            # from the source while the video is analysed, then burned in by the render's
+            # own encode
+            if auto_captions:
+                captions_future = start_ass_captions(job.video_id, local_cfr_path)
 
-            # Initialize face detector
-            face_detector = load_face_detector()
+            # Check out a face detector for this task; it goes back to the pool in finally
+            face_detector = get_face_detector_pool().acquire()
             logger.info("Face detector initialized.")
 
-            # Detect scenes
-            scene_timestamps = detect_scenes(job.video_id, local_cfr_path, db)
-            if not scene_timestamps:
-                logger.info("No scenes detected. Entire video is one scene.")
-                if duration is None:
-                    clip = VideoFileClip(local_cfr_path)
-                    duration = clip.duration
-                    clip.close()
-                scene_timestamps = [(0, duration)]
-
-            # Extract frames (frame_skip=1)
-            frames = extract_frames(local_cfr_path, frame_skip=1)
-            total_frames = len(frames)
-            if total_frames == 0:
-                raise ValueError("No frames extracted from the CFR video.")
-
-            logger.info(f"Extracted {total_frames} frames from {local_cfr_path}.")
-
-            # Quick face detector test
-            test_detections = face_detector.get(frames[0])
-            logger.info(f"Face detector test found {len(test_detections) if test_detections else 0} faces in the first frame.")
-
-            def identify_speakers_in_frame_runtime(frame: np.ndarray, speaker_data: list, face_detector, video_id: int, db: Session) -> list:
-                logger.info("Starting face detection...")
-                detections = face_detector.get(frame)
-                logger.info(f"Found {len(detections) if detections is not None else 0} faces in frame")
-                identified_speakers = []
-
-                if not detections:
-                    logger.warning("No faces detected in frame")
-                    return identified_speakers
+            # Scenes and layouts stored by an earlier run or by detect_scenes_task are reused,
+            # so re-processing with other caption or speaker options skips scene analysis
+            detector_key = scene_detector_key(scene_engine)
+            stored_scenes = load_stored_scene_layouts(db, job.video_id, detector_key, local_cfr_path, face_detector)
+            if stored_scenes:
+                logger.info(f"Using {len(stored_scenes)} stored scenes ({detector_key})")
+                layout_tracker = StoredSceneSchedule(stored_scenes)
+                consumers = [layout_tracker]
+            else:
+                # Scene detection, layout decisions, optional speaker sampling and rendering all
+                # share one decode of the source; each consumer sees every frame in turn
+                scene_detector = create_scene_detector(scene_engine, fps, local_cfr_path)
+                layout_tracker = SceneLayoutTracker(scene_detector, face_detector, video_id=job.video_id, db=db)
+                consumers = [scene_detector, layout_tracker]
+
+            face_sampler = None
+            if detect_speakers:
+                face_sampler = FaceSampler(frame_skip=25, detector=face_detector)
+                consumers.append(face_sampler)
+
+            local_processed_path = local_cfr_path.rsplit('.', 1)[0] + '_processed.mp4'
+            logger.info(f"Rendering final video to {local_processed_path}, fps={fps:.2f}, render_mode={render_mode.value}")
+
+            if render_mode != RenderMode.FRAMES:
+                if stored_scenes and face_sampler is None:
+                    # Nothing left to analyse
+                    frames_read = stored_scenes[-1]['end_frame']
+                else:
+                    # Analysis-only decode; layouts are decided before any frame is rendered
+                    frames_read = run_decode_pass(local_cfr_path, consumers)
+                    if frames_read == 0:
+                        raise ValueError("No frames extracted from the CFR video.")
+                job.progress = 20
+                db.commit()
 
-                try:
-                    # Calculate face sizes and determine threshold
-                    face_sizes = [(i, (face.bbox[2]-face.bbox[0]) * (face.bbox[3]-face.bbox[1])) 
-                                for i, face in enumerate(detections)]
-                    face_sizes.sort(key=lambda x: x[1], reverse=True)
-                    
-                    largest_face_size = face_sizes[0][1]
-                    size_threshold = largest_face_size * 0.2
-                    
-                    logger.info(f"Largest face size: {largest_face_size}, threshold: {size_threshold}")
-
-                    for i, face in enumerate(detections):
-                        try:
-                            bbox = face.bbox.tolist()
-                            x1, y1, x2, y2 = map(int, bbox)
-                            face_size = (x2 - x1) * (y2 - y1)
-                            
-                            if face_size < size_threshold:
-                                logger.warning(f"Skipping small face {i+1}: {x2-x1}x{y2-y1} (area: {face_size} < threshold: {size_threshold})")
-                                continue
-
-                            # Just use the face index as the ID
-                            identified_speakers.append((i + 1, (x1, y1, x2, y2)))
-                            logger.info(f"Added face {i+1} to identified speakers")
-
-                        except Exception as e:
-                            logger.error(f"Error processing face {i+1}: {str(e)}")
-                            continue
+                local_ass_path = captions_future.result() if captions_future else None
+                if render_mode == RenderMode.DISTRIBUTED:
+                    if face_sampler is not None:
+                        store_detected_speakers(job.video_id, face_sampler.finalize(), db)
+                    # This task was the planner; render and reduce tasks finish the job
+                    dispatch_distributed_render(job, layout_tracker.scenes, frames_read, fps, profile, local_ass_path)
+                    if not stored_scenes:
+                        store_tracked_scenes(db, job.video_id, detector_key, layout_tracker.scenes, frames_read, fps)
+                    delete_local_file(local_cfr_path)
+                    if local_ass_path:
+                        delete_local_file(local_ass_path)
+                    return
+
+                if render_mode == RenderMode.FILTERGRAPH:
+                    # The render itself never brings pixels into Python
+                    props = get_video_properties(local_cfr_path)
+                    render_with_filtergraph(
+                        local_cfr_path,
+                        local_processed_path,
+                        layout_tracker.scenes,
+                        total_frames=frames_read,
+                        frame_w=props['width'],
+                        frame_h=props['height'],
+                        profile=profile,
+                        subtitles=local_ass_path
+                    )
+                else:
+                    def on_segment_done(done: int, total: int):
+                        job.progress = 20 + 80 * done / total
+                        db.commit()
+
+                    render_scenes_parallel(
+                        local_cfr_path,
+                        local_processed_path,
+                        layout_tracker.scenes,
+                        total_frames=frames_read,
+                        fps=fps,
+                        on_segment_done=on_segment_done,
+                        profile=profile,
+                        subtitles=local_ass_path
+                    )
+                logger.info(f"Rendered {frames_read} frames in {len(layout_tracker.scenes)} scenes "
+                            f"via {render_mode.value} mode.")
+            else:
+                # Frames stream from the decoder through the layout straight into the encoder,
+                # so neither the source nor the rendered video is ever held in memory
+                props = get_video_properties(local_cfr_path)
+                plans = ScenePlanCache(props['width'], props['height'])
+                # The encoder burns captions in from its first frame, so they are joined here,
+                # after the download and detector setup they overlapped with; waiting keeps the
+                # render a single encode
+                local_ass_path = captions_future.result() if captions_future else None
+                with FFmpegFrameWriter(local_processed_path, fps=fps, audio_source=local_cfr_path, profile=profile,
+                                       subtitles=local_ass_path) as writer:
+                    def render_frame(frame_idx: int, frame: np.ndarray):
+                        scene = layout_tracker.current_scene
+                        if scene['start_frame'] == frame_idx and frame_idx > 0:
+                            job.progress = (frame_idx / total_frames) * 100 if total_frames > 0 else 100
+                            db.commit()
+                        writer.write(plans.render(scene, frame))
+
+                    consumers.append(render_frame)
+                    frames_read = run_decode_pass(local_cfr_path, consumers)
+
+                    if frames_read == 0:
+                        raise ValueError("No frames extracted from the CFR video.")
+                    if writer.frames_written == 0:
+                        logger.error("No processed frames, cannot compile final video.")
+                        raise ValueError("No processed frames to compile.")
+
+                logger.info(f"Rendered {writer.frames_written} of {frames_read} frames in "
+                            f"{len(layout_tracker.scenes)} scenes from {local_cfr_path}.")
+            job.progress = 100
+            db.commit()
 
-                except Exception as e:
-                    logger.error(f"Error in face processing: {str(e)}", exc_info=True)
-                    return identified_speakers
-
-                return identified_speakers
-
-            processed_frames = []
-
-            for (start_time, end_time) in scene_timestamps:
-                start_f = int(start_time * fps)
-                end_f = min(int(end_time * fps), total_frames - 1)
-                rep_frame_idx = max(0, min(start_f, total_frames - 1))
-                rep_frame = frames[rep_frame_idx]
-                logger.info(f"Processing scene from {start_time:.2f}s to {end_time:.2f}s")
-
-                identified = identify_speakers_in_frame_runtime(
-                    frame=rep_frame,
-                    speaker_data=[],
-                    face_detector=face_detector,
-                    video_id=job.video_id,
-                    db=db
-                )
-                layout_config = determine_layout(len(identified))
+            if face_sampler is not None:
+                store_detected_speakers(job.video_id, face_sampler.finalize(), db)
 
-                for f_idx in range(start_f, end_f + 1):
-                    if 0 <= f_idx < total_frames:
-                        out_frame = apply_layout_to_frame(frames[f_idx], identified, layout_config)
-                        if out_frame is not None:
-                            processed_frames.append(out_frame)
+            finish_processed_video(job, db, local_cfr_path, local_processed_path)
+            if local_ass_path:
+                delete_local_file(local_ass_path)
+            # Only once the job is done, so a failed scene write cannot fail a rendered video
+            if not stored_scenes:
+                store_tracked_scenes(db, job.video_id, detector_key, layout_tracker.scenes, frames_read, fps)
 
-                progress = ((end_f + 1) / total_frames) * 100 if total_frames > 0 else 100
-                job.progress = progress
-                db.commit()
+        except Exception as e:
+            logger.error(f"Error in process_video_task for job ID {job_id}: {e}", exc_info=True)
+            mark_job_failed(db, job_id)
+            raise e
+        finally:
+            settle_captions(captions_future)
+            if face_detector is not None:
+                get_face_detector_pool().release(face_detector)
+            shutil.rmtree(local_temp_dir, ignore_errors=True)
+            db.close()
 
-            if not processed_frames:
-                logger.error("No processed frames, cannot compile final video.")
-                raise ValueError("No processed frames to compile.")
+@celery.task(name="app.services.video_processing.preview_video_task")
+def preview_video_task(video_id: int, job_id: int, auto_captions: bool = False, preview_seconds: int = None,
+                       preview_scenes: int = None, scene_engine: str = None):
+    """
+    Render a low-resolution preview with the fastest encoder settings.
+
+    Only the first `preview_seconds` are rendered, or, with `preview_scenes`, the start of
+    that many scenes sampled over the whole video. Scenes and layouts are decided by the
+    same scene engine and SceneLayoutTracker as process_video_task, so the final render
+    matches the preview when both use the same `scene_engine`. The result goes to the job's processed_video_path; the video
+    itself is left alone.
+    """
+    logger.info(f"Starting preview_video_task for video_id={video_id}, job_id={job_id}, auto_captions={auto_captions}, preview_seconds={preview_seconds}, preview_scenes={preview_scenes}")
+
+    with SessionLocal() as db:
+        local_temp_dir = tempfile.mkdtemp()
+        face_detector = None
+        captions_future = None
+        try:
+            job = db.query(ProcessingJob).filter(ProcessingJob.id == job_id).first()
+            if not job:
+                raise ValueError(f"No ProcessingJob found with ID: {job_id}")
 
-            logger.info(f"Compiling final video with {len(processed_frames)} frames, fps={fps:.2f}")
+            job.status = JobStatus.IN_PROGRESS
+            db.commit()
 
-            local_processed_path = compile_video_with_audio(local_cfr_path, processed_frames, fps=fps)
-            if not local_processed_path:
-                raise ValueError("Failed to compile the processed video.")
+            local_cfr_path = os.path.join(local_temp_dir, "input_cfr.mp4")
+            download_s3_to_local(job.video.upload_path, local_cfr_path)
+
+            # Scene cuts and layouts are decided causally, so analysing only the leading clip
+            # gives the same decisions for it as analysing the whole video
+            local_source_path = local_cfr_path
+            clip_seconds = None
+            if not preview_scenes:
+                clip_seconds = preview_seconds or settings.PREVIEW_SECONDS
+                local_source_path = cut_leading_clip(
+                    local_cfr_path, os.path.join(local_temp_dir, "preview_source.mp4"), clip_seconds
+                )
 
-            # 3. Add auto captions if requested
+            fps, source_frames = probe_fps_and_frames(local_source_path)
+            # Captions come from the full source's transcript, cut to the clip when there is one
             if auto_captions:
-                srt_path = generate_srt_with_whisper(local_processed_path)
-
-                local_ass_path = srt_path.rsplit('.', 1)[0] + '.ass'
-                srt_to_ass(srt_path, ASS_TEMPLATE_PATH, local_ass_path)
-                
-                local_captioned_path = local_processed_path.rsplit('.', 1)[0] + '_with_captions.mp4'
-                burn_in_ass_captions(
-                    local_processed_path,
-                    local_ass_path,
-                    local_captioned_path
+                clip_path = local_source_path if clip_seconds else None
+                captions_future = start_ass_captions(job.video_id, local_cfr_path, clip_path, clip_seconds)
+
+            face_detector = get_face_detector_pool().acquire()
+            detector_key = scene_detector_key(scene_engine)
+            # The leading clip shares its frame numbers with the full video, so stored scenes
+            # apply to it as they are, cut off at the clip's end
+            stored_layouts = load_stored_scene_layouts(db, job.video_id, detector_key, local_cfr_path, face_detector)
+            if stored_layouts:
+                scenes = stored_layouts
+                scenes = [scene for scene in scenes if scene['start_frame'] < source_frames]
+                frames_read = min(source_frames, scenes[-1]['end_frame'])
+            else:
+                scene_detector = create_scene_detector(scene_engine, fps, local_source_path)
+                layout_tracker = SceneLayoutTracker(scene_detector, face_detector, video_id=job.video_id, db=db)
+                frames_read = run_decode_pass(local_source_path, [scene_detector, layout_tracker])
+                if frames_read == 0:
+                    raise ValueError("No frames extracted from the CFR video.")
+                scenes = layout_tracker.scenes
+            job.progress = 50
+            db.commit()
+            local_ass_path = captions_future.result() if captions_future else None
+
+            props = get_video_properties(local_source_path)
+            local_preview_path = os.path.join(local_temp_dir, "preview.mp4")
+            if preview_scenes:
+                ranges = sample_scene_ranges(
+                    scenes, frames_read, preview_scenes, int(fps * settings.PREVIEW_SCENE_SECONDS)
+                )
+                render_sampled_scenes(
+                    local_source_path, local_preview_path, ranges, fps,
+                    frame_w=props['width'],
+                    frame_h=props['height'],
+                    profile=EncodingProfile.DRAFT,
+                    subtitles=local_ass_path,
+                    output_size=(PREVIEW_WIDTH, PREVIEW_HEIGHT)
+                )
+            else:
+                render_with_filtergraph(
+                    local_source_path, local_preview_path,
+                    scenes,
+                    total_frames=frames_read,
+                    frame_w=props['width'],
+                    frame_h=props['height'],
+                    profile=EncodingProfile.DRAFT,
+                    subtitles=local_ass_path,
+                    output_size=(PREVIEW_WIDTH, PREVIEW_HEIGHT)
                 )
-                delete_local_file(local_processed_path)
-                local_processed_path = local_captioned_path
-
-            # 4. After finishing, upload the final processed video
-            processed_filename = f"{uuid.uuid4()}_cfr_processed.mp4"
-            s3_key_processed = f"videos/{processed_filename}"
-            s3_url_processed = upload_file_to_s3(local_processed_path, s3_key_processed)
-            logger.info(f"Uploaded final processed video to S3: {s3_url_processed}")
-
-            # 5. Store it in processed_path
-            job.video.processed_path = s3_url_processed  # store final S3 URL
-            job.video.status = VideoStatus.PROCESSED
+
+            s3_url_preview = upload_file_to_s3(local_preview_path, f"previews/{uuid.uuid4()}_preview.mp4")
+            job.processed_video_path = s3_url_preview
             job.status = JobStatus.COMPLETED
+            job.progress = 100
             db.commit()
+            logger.info(f"Preview for video ID {job.video_id} ready: {s3_url_preview}")
 
-            logger.info(f"Video ID {video_id} marked completed. processed_video_path = {s3_url_processed}")
-
-            # Clean up
-            delete_local_file(local_cfr_path)
-            delete_local_file(local_processed_path)
+            if preview_scenes and not stored_layouts:
+                # The whole video was analysed, so a later full render can reuse it
+                store_tracked_scenes(db, job.video_id, detector_key, scenes, frames_read, fps)
 
         except Exception as e:
-            logger.error(f"Error in process_video_task for job ID {job_id}: {e}", exc_info=True)
-            db.rollback()
+            logger.error(f"Error in preview_video_task for job ID {job_id}: {e}", exc_info=True)
+            # A failed preview says nothing about the video itself
+            mark_job_failed(db, job_id, fail_video=False)
+            raise e
+        finally:
+            # The caption thread writes into the temp dir, so it has to finish first
+            settle_captions(captions_future)
+            if face_detector is not None:
+                get_face_detector_pool().release(face_detector)
+            shutil.rmtree(local_temp_dir, ignore_errors=True)
+            db.close()
+
+def probe_fps_and_frames(video_path: str) -> tuple:
+    """Return (fps, total_frames) from ffprobe, falling back to the container metadata."""
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0", 
+        "-show_entries", "stream=duration,nb_frames",
+        "-of", "default=noprint_wrappers=1", video_path
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    duration = None
+    nb_frames = None
+    for line in result.stdout.splitlines():
+        if line.startswith("duration="):
+            duration = float(line.split('=')[1].strip())
+        elif line.startswith("nb_frames="):
+            nb_frames = float(line.split('=')[1].strip())
+
+    if duration is None or nb_frames is None:
+        logger.warning("Could not retrieve duration or nb_frames from ffprobe. Falling back to container fps.")
+        props = get_video_properties(video_path)
+        logger.info(f"Using fps from container: {props['fps']} FPS")
+        return props['fps'], props['frame_count']
+
+    fps = nb_frames / duration
+    logger.info(f"Calculated FPS from ffprobe: {fps:.4f}")
+    return fps, int(nb_frames)
+
+def dispatch_distributed_render(job: ProcessingJob, scenes: list, total_frames: int, fps: float,
+                                profile: str = EncodingProfile.STANDARD, ass_path: str = None):
+    """
+    Fan the render out as a Celery chord: one render_segment_task per timeline segment,
+    then concat_segments_task to stream-copy them together and finish the job.
+
+    The captions of `ass_path` travel with each segment task so they are burned in by the
+    segment encodes.
+    """
+    captions_ass = None
+    if ass_path:
+        with open(ass_path, 'r', encoding='utf-8') as f:
+            captions_ass = f.read()
+
+    segment_frames = max(1, int(fps * settings.DISTRIBUTED_SEGMENT_SECONDS))
+    num_segments = -(-total_frames // segment_frames)
+    segments = plan_segments(scenes, total_frames, num_segments)
+
+    header = [
+        render_segment_task.s(
+            job.video.upload_path, job.id, i, start_frame, end_frame,
+            scenes_in_range(scenes, start_frame, end_frame), fps, EncodingProfile(profile).value,
+            captions_ass
+        )
+        for i, (start_frame, end_frame) in enumerate(segments)
+    ]
+    callback = concat_segments_task.s(job.video_id, job.id).on_error(
+        distributed_render_failed.s(job.id, len(header))
+    )
+    chord(header)(callback)
+    logger.info(f"Dispatched {len(header)} segment render tasks for job ID {job.id}")
+
+def segment_key(job_id: int, segment_index: int) -> str:
+    return f"segments/{job_id}/segment_{segment_index:05d}.mp4"
+
+@celery.task(name="app.services.video_processing.render_segment_task")
+def render_segment_task(source_url: str, job_id: int, segment_index: int, start_frame: int, end_frame: int,
+                        scenes: list, fps: float, encoding_profile: str = EncodingProfile.STANDARD.value,
+                        captions_ass: str = None) -> str:
+    """Chord header: render frames [start_frame, end_frame) of the source and upload the segment."""
+    logger.info(f"Rendering segment {segment_index} ({start_frame}-{end_frame}) for job ID {job_id}")
+    local_temp_dir = tempfile.mkdtemp()
+    try:
+        local_ass_path = None
+        if captions_ass:
+            local_ass_path = os.path.join(local_temp_dir, "captions.ass")
+            with open(local_ass_path, 'w', encoding='utf-8') as f:
+                f.write(captions_ass)
+
+        # Every segment is its own encode with the same profile, so it starts on a keyframe
+        # and the reduce step can join segments by stream copy
+        segment_path = os.path.join(local_temp_dir, f"segment_{segment_index:05d}.mp4")
+        with segment_sources.local_copy(source_url) as local_cfr_path:
+            render_frame_range(local_cfr_path, segment_path, scenes, start_frame, end_frame, fps,
+                               profile=encoding_profile, subtitles=local_ass_path)
+        return upload_file_to_s3(segment_path, segment_key(job_id, segment_index))
+    finally:
+        shutil.rmtree(local_temp_dir, ignore_errors=True)
+
+@celery.task(name="app.services.video_processing.concat_segments_task")
+def concat_segments_task(segment_urls: list, video_id: int, job_id: int):
+    """Chord callback: join the rendered segments, mux the source audio and finish the job."""
+    logger.info(f"Concatenating {len(segment_urls)} segments for video_id={video_id}, job_id={job_id}")
+    with SessionLocal() as db:
+        local_temp_dir = tempfile.mkdtemp()
+        try:
             job = db.query(ProcessingJob).filter(ProcessingJob.id == job_id).first()
-            if job:
-                job.status = JobStatus.FAILED
-                job.video.status = VideoStatus.FAILED
-                db.commit()
+            if not job:
+                raise ValueError(f"No ProcessingJob found with ID: {job_id}")
+
+            local_cfr_path = os.path.join(local_temp_dir, "input_cfr.mp4")
+            download_s3_to_local(job.video.upload_path, local_cfr_path)
+
+            segment_paths = []
+            for i, segment_url in enumerate(segment_urls):
+                segment_path = os.path.join(local_temp_dir, f"segment_{i:05d}.mp4")
+                download_s3_to_local(segment_url, segment_path)
+                segment_paths.append(segment_path)
+
+            local_processed_path = local_cfr_path.rsplit('.', 1)[0] + '_processed.mp4'
+            concat_segments(segment_paths, local_processed_path, audio_source=local_cfr_path)
+            for segment_path in segment_paths:
+                delete_local_file(segment_path)
+            job.progress = 90
+            db.commit()
+
+            finish_processed_video(job, db, local_cfr_path, local_processed_path)
+
+        except Exception as e:
+            logger.error(f"Error in concat_segments_task for job ID {job_id}: {e}", exc_info=True)
+            mark_job_failed(db, job_id)
             raise e
         finally:
+            for segment_url in segment_urls:
+                try:
+                    delete_file_from_s3(segment_url)
+                except Exception as e:
+                    logger.warning(f"Failed to delete segment {segment_url}: {e}")
+            shutil.rmtree(local_temp_dir, ignore_errors=True)
             db.close()
 
+@celery.task(name="app.services.video_processing.distributed_render_failed")
+def distributed_render_failed(request, exc, traceback, job_id: int, num_segments: int):
+    """Chord error callback: a segment or the reduce step failed. Uploaded segments are deleted."""
+    logger.error(f"Distributed render failed for job ID {job_id}: {exc}")
+    with SessionLocal() as db:
+        mark_job_failed(db, job_id)
+    for segment_index in range(num_segments):
+        # Deleting a segment that was never uploaded is a no-op on S3
+        segment_url = s3_url_for_key(segment_key(job_id, segment_index))
+        try:
+            delete_file_from_s3(segment_url)
+        except Exception as e:
+            logger.warning(f"Failed to delete segment {segment_url}: {e}")
+
+def finish_processed_video(job: ProcessingJob, db: Session, local_cfr_path: str, local_processed_path: str):
+    """Upload and record a rendered video, then mark the job completed."""
+    # 4. After finishing, upload the final processed video
+    processed_filename = f"{uuid.uuid4()}_cfr_processed.mp4"
+    s3_key_processed = f"videos/{processed_filename}"
+    s3_url_processed = upload_file_to_s3(local_processed_path, s3_key_processed)
+    logger.info(f"Uploaded final processed video to S3: {s3_url_processed}")
+
+    # 5. Store it in processed_path
+    job.video.processed_path = s3_url_processed  # store final S3 URL
+    job.video.status = VideoStatus.PROCESSED
+    job.status = JobStatus.COMPLETED
+    job.progress = 100
+    db.commit()
+
+    logger.info(f"Video ID {job.video_id} marked completed. processed_video_path = {s3_url_processed}")
+
+    # Clean up
+    delete_local_file(local_cfr_path)
+    delete_local_file(local_processed_path)
+
+def mark_job_failed(db: Session, job_id: int, fail_video: bool = True):
+    db.rollback()
+    job = db.query(ProcessingJob).filter(ProcessingJob.id == job_id).first()
+    if job:
+        job.status = JobStatus.FAILED
+        if fail_video:
+            job.video.status = VideoStatus.FAILED
+        db.commit()
+
+def identify_speakers_in_frame_runtime(frame: np.ndarray, speaker_data: list, face_detector, video_id: int, db: Session) -> list:
+    """Return (face_number, bbox) for every face at least 20% the size of the largest one."""
+    logger.info("Starting face detection...")
+    # Only boxes are needed here, so no embeddings are computed
+    detections = detect_faces(face_detector, frame)
+    logger.info(f"Found {len(detections) if detections is not None else 0} faces in frame")
+    identified_speakers = []
+
+    if not detections:
+        logger.warning("No faces detected in frame")
+        return identified_speakers
+
+    try:
+        # Calculate face sizes and determine threshold
+        face_sizes = [(i, (face.bbox[2]-face.bbox[0]) * (face.bbox[3]-face.bbox[1])) 
+                    for i, face in enumerate(detections)]
+        face_sizes.sort(key=lambda x: x[1], reverse=True)
+
+        largest_face_size = face_sizes[0][1]
+        size_threshold = largest_face_size * 0.2
+
+        logger.info(f"Largest face size: {largest_face_size}, threshold: {size_threshold}")
+
+        for i, face in enumerate(detections):
+            try:
+                bbox = face.bbox.tolist()
+                x1, y1, x2, y2 = clamp_box(tuple(map(int, bbox)), frame.shape[1], frame.shape[0])
+                face_size = (x2 - x1) * (y2 - y1)
+
+                if face_size < size_threshold:
+                    logger.warning(f"Skipping small face {i+1}: {x2-x1}x{y2-y1} (area: {face_size} < threshold: {size_threshold})")
+                    continue
+
+                # Just use the face index as the ID
+                identified_speakers.append((i + 1, (x1, y1, x2, y2)))
+                logger.info(f"Added face {i+1} to identified speakers")
+
+            except Exception as e:
+                logger.error(f"Error processing face {i+1}: {str(e)}")
+                continue
+
+    except Exception as e:
+        logger.error(f"Error in face processing: {str(e)}", exc_info=True)
+        return identified_speakers
+
+    return identified_speakers
+
+class SceneLayoutTracker:
+    """
+    Decode-pass consumer that fixes each scene's speakers and layout from its first frame.
+
+    Must come after `scene_detector` in the consumer list, so a cut found on a frame is
+    already known when that frame reaches the tracker.
+    """
+
+    def __init__(self, scene_detector: SceneDetector, face_detector, video_id: int, db: Session):
+        self.scene_detector = scene_detector
+        self.face_detector = face_detector
+        self.video_id = video_id
+        self.db = db
+        self.scenes = []  # One dict per scene: start_frame, identified, layout_config
+
+    @property
+    def current_scene(self) -> dict:
+        return self.scenes[-1]
+
+    def __call__(self, frame_idx: int, frame: np.ndarray):
+        if self.scenes and self.scene_detector.current_scene_start != frame_idx:
+            return
+
+        logger.info(f"Processing scene starting at {frame_idx / self.scene_detector.fps:.2f}s")
+        self.scenes.append(decide_scene_layout(frame_idx, frame, self.face_detector, self.video_id, self.db))
+
+def decide_scene_layout(frame_idx: int, frame: np.ndarray, face_detector, video_id: int, db: Session) -> dict:
+    """Scene dict for a scene starting at `frame`; the first frame is its representative frame."""
+    identified = identify_speakers_in_frame_runtime(
+        frame=frame,
+        speaker_data=[],
+        face_detector=face_detector,
+        video_id=video_id,
+        db=db
+    )
+    return {
+        'start_frame': frame_idx,
+        'identified': identified,
+        'layout_config': determine_layout(len(identified)),
+    }
+
+class StoredSceneSchedule:
+    """
+    Decode-pass stand-in for a SceneDetector plus SceneLayoutTracker when the scenes and
+    their layouts are already known: it only tracks which scene each frame belongs to.
+    """
+
+    def __init__(self, scenes: list):
+        self.scenes = scenes
+        self._scene_idx = 0
+
+    @property
+    def current_scene(self) -> dict:
+        return self.scenes[self._scene_idx]
+
+    def __call__(self, frame_idx: int, frame: np.ndarray):
+        while self._scene_idx + 1 < len(self.scenes) and frame_idx >= self.scenes[self._scene_idx + 1]['start_frame']:
+            self._scene_idx += 1
+
+def store_tracked_scenes(db: Session, video_id: int, detector_key: str, scenes: list, total_frames: int, fps: float):
+    """
+    Store the scenes and layouts a SceneLayoutTracker decided during a full pass.
+
+    Best-effort: the rows only save later runs an analysis pass, and a detect_scenes_task
+    writing the same video's scenes at the same time can make the insert fail.
+    """
+    try:
+        store_scenes(
+            db, video_id, detector_key,
+            [scene['start_frame'] for scene in scenes],
+            total_frames, fps,
+            layouts=[{'identified': scene['identified'], 'layout_config': scene['layout_config']} for scene in scenes]
+        )
+    except Exception as e:
+        logger.warning(f"Could not store scenes for video ID {video_id} ({detector_key}): {e}")
+        db.rollback()
+
+def load_stored_scene_layouts(db: Session, video_id: int, detector_key: str, video_path: str, face_detector) -> list:
+    """
+    Scene dicts (start_frame, end_frame, identified, layout_config) from the stored scenes,
+    or None if there are none.
+
+    Scenes stored without a layout (by detect_scenes_task) get one from their first frame,
+    read by seeking rather than decoding the video, and the layout is saved on the row.
+    """
+    rows = load_stored_scenes(db, video_id, detector_key)
+    if not rows:
+        return None
+
+    missing = {row.start_frame: row for row in rows if not row.layout}
+    if missing:
+        logger.info(f"Deciding layouts for {len(missing)} stored scenes of video ID {video_id}")
+        for frame_idx, frame in read_frames_at(video_path, list(missing)):
+            scene = decide_scene_layout(frame_idx, frame, face_detector, video_id, db)
+            missing[frame_idx].layout = json.dumps({
+                'identified': scene['identified'],
+                'layout_config': scene['layout_config'],
+            })
+        db.commit()
+
+    scenes = []
+    for row in rows:
+        layout = json.loads(row.layout) if row.layout else {'identified': [], 'layout_config': determine_layout(0)}
+        scenes.append({
+            'start_frame': row.start_frame,
+            'end_frame': row.end_frame,
+            'identified': layout['identified'],
+            'layout_config': layout['layout_config'],
+        })
+    return scenes
+
 def load_speakers_for_video(db: Session, video_id: int) -> list:
     speakers = db.query(Speaker).filter(Speaker.video_id == video_id).all()
     speaker_data = []
@@ -288,71 +762,143 @@ def load_speakers_for_video(db: Session, video_id: int) -> list:
     logger.info(f"Speaker data mapping: {[(s[0], s[1]) for s in speaker_data]}")
     return speaker_data
 
-def generate_srt_with_whisper(video_path: str) -> str:
+def transcribe_video(video_path: str) -> list:
+    """
+    Transcribe `video_path` into {'start', 'end', 'text'[, 'words']} segments.
+
+    Whisper gets a 16 kHz mono FLAC of the audio rather than the video itself; long audio
+    is transcribed in parallel chunks (see transcribe_segments).
     """
-    Run Whisper on `video_path`, produce an .srt file, and return its path.
+    audio_path = extract_asr_audio(video_path, video_path.rsplit('.', 1)[0] + '_asr.flac')
+    try:
+        logger.info("Running Whisper transcription... might take a bit.")
+        return transcribe_segments(audio_path)
+    finally:
+        delete_local_file(audio_path)
+
+def load_transcript(db: Session, video_id: int, content_hash: str, model: str) -> list:
+    """Stored segments of a video's source with this content hash and model, or None."""
+    transcript = db.query(Transcript).filter(
+        Transcript.video_id == video_id,
+        Transcript.content_hash == content_hash,
+        Transcript.model == model
+    ).first()
+    return json.loads(transcript.segments) if transcript else None
+
+def store_transcript(db: Session, video_id: int, content_hash: str, model: str, segments: list):
+    db.add(Transcript(
+        video_id=video_id,
+        content_hash=content_hash,
+        model=model,
+        segments=json.dumps(segments)
+    ))
+    db.commit()
+    logger.info(f"Stored transcript of video ID {video_id} ({model}, {len(segments)} segments)")
+
+def video_transcript(video_id: int, video_path: str) -> list:
     """
-    model = whisper.load_model("base")
-    logger.info("Running Whisper transcription... might take a bit.")
-    result = model.transcribe(video_path)
-    
-    srt_path = video_path.rsplit('.', 1)[0] + '.srt'
-    with open(srt_path, 'w', encoding='utf-8') as f:
-        for i, seg in enumerate(result['segments'], start=1):
-            start = seg['start']
-            end = seg['end']
-            text = seg['text'].strip()
-            
-            start_srt = to_srt_timestamp(start)
-            end_srt = to_srt_timestamp(end)
-            
-            f.write(f"{i}\n{start_srt} --> {end_srt}\n{text}\n\n")
-    
-    logger.info(f"SRT file saved at {srt_path}")
-    return srt_path
-
-def to_srt_timestamp(seconds: float) -> str:
-    """Helper to convert 12.345 to HH:MM:SS,mmm for SRT."""
-    h = int(seconds // 3600)
-    m = int((seconds % 3600) // 60)
-    s = int(seconds % 60)
-    ms = int((seconds - int(seconds)) * 1000)
-    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
-
-def burn_in_captions(input_video: str, srt_file: str, output_video: str):
+    Segments of `video_path`, transcribed once per video, source content and model.
+
+    Re-renders of the same source, with any caption style or layout, reuse the stored
+    transcript instead of running Whisper again. Runs on caption threads, so it uses a
+    session of its own.
     """
-    Use ffmpeg to burn SRT into the video frames.
+    content_hash = file_sha256(video_path)
+    model = transcript_model_key()
+    with SessionLocal() as db:
+        segments = load_transcript(db, video_id, content_hash, model)
+        if segments is not None:
+            logger.info(f"Using stored transcript of video ID {video_id} ({model})")
+            return segments
+
+        segments = transcribe_video(video_path)
+        try:
+            store_transcript(db, video_id, content_hash, model, segments)
+        except IntegrityError:
+            # A concurrent job stored the same transcript first
+            db.rollback()
+        return segments
+
+def clip_segments(segments: list, end_seconds: float) -> list:
+    """The part of a transcript before `end_seconds`, with the last segment cut off there."""
+    clipped = []
+    for segment in segments:
+        if segment['start'] >= end_seconds:
+            break
+        segment = dict(segment, end=min(segment['end'], end_seconds))
+        if 'words' in segment:
+            segment['words'] = [
+                dict(word, end=min(word['end'], end_seconds))
+                for word in segment['words'] if word['start'] < end_seconds
+            ]
+        clipped.append(segment)
+    return clipped
+
+def leading_clip_transcript(video_id: int, video_path: str, clip_path: str, clip_seconds: float) -> list:
     """
-    logger.info(f"Burning captions from {srt_file} into {input_video} => {output_video}")
-    
-    cmd = [
-        "ffmpeg", "-y",
-        "-i", input_video,
-        "-vf", f"subtitles='{srt_file}'",
-        "-c:a", "copy",
-        output_video
-    ]
-    
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if result.returncode != 0:
-        logger.error(f"Error burning in captions: {result.stderr}")
-        raise RuntimeError("Failed to burn captions via ffmpeg.")
-    
-    logger.info("Captions burned successfully.")
+    Segments of the first `clip_seconds` of `video_path`, which `clip_path` was cut from.
+
+    A stored transcript of the full source is cut at the clip's end. Without one, only the
+    clip is transcribed, and not stored: its hash differs from the source's for every clip
+    length, so the row would never be reused.
+    """
+    content_hash = file_sha256(video_path)
+    model = transcript_model_key()
+    with SessionLocal() as db:
+        segments = load_transcript(db, video_id, content_hash, model)
+    if segments is None:
+        return transcribe_video(clip_path)
+    logger.info(f"Using the first {clip_seconds}s of the stored transcript of video ID {video_id} ({model})")
+    return clip_segments(segments, clip_seconds)
+
+def generate_ass_captions(video_id: int, video_path: str, clip_path: str = None, clip_seconds: float = None) -> str:
+    """
+    Style the transcript of `video_path` with the .ass template, ready to be burned in by
+    the render. With `clip_path`, the captions are for that leading clip of `clip_seconds`
+    (see leading_clip_transcript). Returns the .ass path.
+    """
+    if clip_path:
+        segments = leading_clip_transcript(video_id, video_path, clip_path, clip_seconds)
+    else:
+        segments = video_transcript(video_id, video_path)
+    ass_path = (clip_path or video_path).rsplit('.', 1)[0] + '.ass'
+    segments_to_ass(segments, ASS_TEMPLATE_PATH, ass_path)
+    return ass_path
+
+def start_ass_captions(video_id: int, video_path: str, clip_path: str = None, clip_seconds: float = None) -> Future:
+    """
+    Run generate_ass_captions on a background thread; the Future yields the .ass path.
 
+    Whisper's heavy lifting happens in torch with the GIL released, so it overlaps with
+    the decode and render work of the calling task.
+    """
+    return caption_executor.submit(generate_ass_captions, video_id, video_path, clip_path, clip_seconds)
 
-def srt_to_ass(srt_path: str, template_ass_path: str, output_ass_path: str):
+def settle_captions(captions_future: Future):
     """
-    Naively convert an .srt file's lines into .ass 'Dialogue:' lines,
-    reusing the [Script Info] + [V4+ Styles] from `template_ass_path`.
-    Then write the combined result to `output_ass_path`.
+    Make sure the captions of a finishing task are no longer running.
+
+    A transcription that has not started is cancelled. One that is running cannot be
+    interrupted, so it is waited for: its files are in the task's temp dir, and the
+    transcript it stores is reused by the next run. Its errors are logged only, since the
+    task either consumed the result already or is failing for its own reason.
+    """
+    if captions_future is None or captions_future.cancel():
+        return
+    try:
+        captions_future.result()
+    except Exception as e:
+        logger.warning(f"Caption generation failed: {e}")
+
+def segments_to_ass(segments: list, template_ass_path: str, output_ass_path: str):
+    """
+    Write transcript segments ({'start', 'end', 'text'} in seconds) as .ass 'Dialogue:'
+    lines, reusing the [Script Info] + [V4+ Styles] from `template_ass_path`.
 
     1) We'll read all lines from `template_ass_path` up to the "[Events]" section,
-       store them. Then we write our own "[Events]" block with the
-       newly created "Dialogue: ..." lines from the SRT file.
+       store them. Then we write our own "[Events]" block with one
+       "Dialogue: ..." line per segment.
     2) We assume the template .ass includes a "Default" style in the [V4+ Styles] section.
-
-    NOTE: This is a minimal approach with simplistic SRT parsing.
     """
     # 1) Grab the lines from the template .ass
     with open(template_ass_path, 'r', encoding='utf-8') as f:
@@ -362,49 +908,13 @@ def srt_to_ass(srt_path: str, template_ass_path: str, output_ass_path: str):
     #  - everything up to "[Events]" or "Events]" 
     #  - ignore or remove any existing lines in [Events] from the template
     header_lines = []
-    found_events = False
     for line in template_lines:
         # Check if line starts with "[Events]"
         if line.strip().lower().startswith("[events]"):
-            found_events = True
             break
         header_lines.append(line)
 
-    # 2) Parse the SRT lines => produce a list of (start_time, end_time, text)
-    #    We'll store times in ASS format "H:MM:SS.xx" or "0:00:05.07" etc.
-    #    SRT times are "HH:MM:SS,mmm"
-    subs = []
-    with open(srt_path, 'r', encoding='utf-8') as f:
-        srt_data = f.read().strip()
-
-    # A naive SRT chunk parser:
-    # each block is:
-    #   number
-    #   00:00:01,200 --> 00:00:03,400
-    #   line of text
-    #   line of text
-    #   (blank line)
-    blocks = srt_data.split("\n\n")
-    for block in blocks:
-        lines = block.splitlines()
-        if len(lines) >= 2:
-            # lines[0] is the numeric index
-            # lines[1] is the time range
-            # the rest are text lines
-            time_line = lines[1]
-            text_lines = lines[2:]
-            full_text = " ".join(text_lines).replace("\n", " ").strip()
-
-            # parse "00:00:01,200 --> 00:00:03,400"
-            match = re.match(r"(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})", time_line)
-            if match:
-                start_str, end_str = match.groups()
-                start_ass = _srt_time_to_ass_time(start_str)
-                end_ass = _srt_time_to_ass_time(end_str)
-
-                subs.append((start_ass, end_ass, full_text))
-
-    # 3) Create the [Events] lines from these subs
+    # 2) Create the [Events] lines from the segments
     #    Basic format: 
     #    Dialogue: 0,<start>,<end>,Default,,0,0,0,,Hello world
     # We'll use the "Default" style from the template [V4+ Styles]
@@ -412,38 +922,25 @@ def srt_to_ass(srt_path: str, template_ass_path: str, output_ass_path: str):
     event_lines.append("[Events]\n")
     event_lines.append("Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n")
 
-    for (start, end, text) in subs:
+    for seg in segments:
+        start = _seconds_to_ass_time(seg['start'])
+        end = _seconds_to_ass_time(seg['end'])
+        text = seg['text'].replace("\n", " ").strip()
         # e.g.: "Dialogue: 0,0:00:01.20,0:00:03.40,Default,,0,0,0,,Some text"
-        line = f"Dialogue: 0,{start},{end},Default,,0,0,0,,{text}\n"
-        event_lines.append(line)
+        event_lines.append(f"Dialogue: 0,{start},{end},Default,,0,0,0,,{text}\n")
 
-    # 4) Combine header_lines + event_lines => output_ass_path
+    # 3) Combine header_lines + event_lines => output_ass_path
     with open(output_ass_path, 'w', encoding='utf-8') as f:
         for line in header_lines:
             f.write(line)
         for line in event_lines:
             f.write(line)
 
-
-def _srt_time_to_ass_time(srt_time: str) -> str:
+def _seconds_to_ass_time(total_seconds: float) -> str:
     """
-    Convert 'HH:MM:SS,mmm' => 'H:MM:SS.xx' for .ass Dialogue
-    e.g. '00:01:02,250' => '0:01:02.25'
+    Convert seconds => 'H:MM:SS.xx' for .ass Dialogue
+    e.g. 62.25 => '0:01:02.25'
     """
-    # parse with datetime or do manual splits
-    # Quick approach:
-    h, m, s_ms = srt_time.split(":")
-    s, ms = s_ms.split(",")
-    hours = int(h)
-    mins = int(m)
-    secs = int(s)
-    msecs = int(ms)
-
-    # Convert total to seconds + fraction
-    # Then reformat as e.g. 0:00:05.07
-    td = datetime.timedelta(hours=hours, minutes=mins, seconds=secs, milliseconds=msecs)
-    total_seconds = td.total_seconds()
-
     # Build "H:MM:SS.xx"
     # e.g. hours might be e.g. 0, 1, etc. 
     # We keep it minimal, e.g. if hours=0 => "0:01:02.25"
@@ -454,37 +951,3 @@ def _srt_time_to_ass_time(srt_time: str) -> str:
     secs_part = remainder % 60
 
     return f"{hours_part}:{mins_part:02d}:{secs_part:05.2f}"
-
-
-def burn_in_ass_captions(input_video: str, ass_file: str, output_video: str):
-    """
-    Use ffmpeg to burn a static .ass stylesheet (and potentially the transcript lines)
-    into the final video frames.
-    """
-    logger.info(f"Burning .ass subtitles from {ass_file} into {input_video} => {output_video}")
-
-    # Debugging: Verify file exists and can be read
-    if not os.path.exists(ass_file):
-        raise FileNotFoundError(f"The ASS file '{ass_file}' does not exist.")
-    logger.info(f"Using ASS file: {ass_file}")
-
-    cmd = [
-        "ffmpeg", "-y",
-        "-i", input_video,
-        "-vf", (
-            f"subtitles={ass_file}:force_style='"
-            "Alignment=10,"
-            "Outline=5,"
-            "OutlineColour=&H000000,"
-            "Shadow=3,"
-        ),
-        "-c:a", "copy",
-        output_video
-    ]
-
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    if result.returncode != 0:
-        logger.error(f"Error burning in .ass subtitles: {result.stderr}")
-        raise RuntimeError("Failed to burn .ass subtitles via ffmpeg.")
-
-    logger.info("ASS subtitles burned successfully.")
\ No newline at end of file
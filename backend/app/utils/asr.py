@@ -0,0 +1,135 @@
+# backend/app/utils/asr.py
+
+import logging
+import multiprocessing
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from app.config import settings
+from app.utils.model_registry import whisper_models
+
+logger = logging.getLogger(__name__)
+
+ASR_SAMPLE_RATE = 16000
+# Energy is measured over 30 ms frames and smoothed over 300 ms when looking for pauses
+VAD_FRAME_SECONDS = 0.03
+VAD_SMOOTHING_FRAMES = 10
+
+def load_asr_pcm(audio_path: str) -> np.ndarray:
+    """Decode `audio_path` to 16 kHz mono float32 samples in [-1, 1], as Whisper reads it."""
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-i", audio_path,
+        "-f", "s16le", "-ac", "1", "-ar", str(ASR_SAMPLE_RATE),
+        "-"
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        logger.error(f"ffmpeg audio decode failed: {result.stderr.decode(errors='replace')}")
+        raise RuntimeError("Failed to decode audio via ffmpeg.")
+    return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+
+def split_at_pauses(pcm: np.ndarray, chunk_seconds: float, search_seconds: float = 15.0) -> list:
+    """
+    Split `pcm` into (start_sample, end_sample) chunks of about `chunk_seconds`.
+
+    Each cut is placed at the quietest point, by smoothed frame energy, within
+    `search_seconds` of the target length, so cuts land in pauses between words rather
+    than inside them.
+    """
+    frame_len = int(ASR_SAMPLE_RATE * VAD_FRAME_SECONDS)
+    n_frames = len(pcm) // frame_len
+    if n_frames == 0:
+        return [(0, len(pcm))]
+
+    frames = pcm[:n_frames * frame_len].reshape(n_frames, frame_len)
+    energy = np.sqrt(np.mean(frames ** 2, axis=1))
+    kernel = np.ones(VAD_SMOOTHING_FRAMES) / VAD_SMOOTHING_FRAMES
+    energy = np.convolve(energy, kernel, mode='same')
+
+    frames_per_chunk = int(chunk_seconds / VAD_FRAME_SECONDS)
+    search = int(search_seconds / VAD_FRAME_SECONDS)
+    cuts = [0]
+    while n_frames - cuts[-1] > frames_per_chunk + search:
+        lo = cuts[-1] + frames_per_chunk - search
+        hi = cuts[-1] + frames_per_chunk + search
+        cuts.append(lo + int(np.argmin(energy[lo:hi])))
+
+    bounds = [cut * frame_len for cut in cuts] + [len(pcm)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _init_asr_worker(threads: int):
+    import torch
+    # Workers split the cores between them instead of each using all of them
+    torch.set_num_threads(threads)
+
+def transcript_model_key(model_name: str = None, word_timestamps: bool = None) -> str:
+    """Identifies the model and options a transcript was made with, e.g. 'whisper-base+words'."""
+    model_name = model_name or settings.WHISPER_MODEL
+    if word_timestamps is None:
+        word_timestamps = settings.ASR_WORD_TIMESTAMPS
+    return f"whisper-{model_name}" + ("+words" if word_timestamps else "")
+
+def transcribe_chunk(pcm: np.ndarray, offset_seconds: float, model_name: str = None,
+                     word_timestamps: bool = False) -> list:
+    """
+    Whisper segments of one chunk as {'start', 'end', 'text'} dicts on the full timeline,
+    plus 'words' ({'start', 'end', 'word'}) with `word_timestamps`.
+    Used as a process-pool worker; each worker keeps its model resident between chunks.
+    """
+    with whisper_models.use(model_name) as model:
+        result = model.transcribe(pcm, word_timestamps=word_timestamps)
+
+    segments = []
+    for seg in result['segments']:
+        segment = {
+            'start': seg['start'] + offset_seconds,
+            'end': seg['end'] + offset_seconds,
+            'text': seg['text'],
+        }
+        if word_timestamps:
+            segment['words'] = [
+                {'start': w['start'] + offset_seconds, 'end': w['end'] + offset_seconds, 'word': w['word']}
+                for w in seg.get('words', [])
+            ]
+        segments.append(segment)
+    return segments
+
+def transcribe_segments(audio_path: str, workers: int = None, word_timestamps: bool = None) -> list:
+    """
+    Transcribe a 16 kHz mono audio file into {'start', 'end', 'text'} segments.
+
+    Audio of at least settings.ASR_CHUNKED_MIN_SECONDS is split at pauses into
+    settings.ASR_CHUNK_SECONDS chunks and transcribed by `workers` processes
+    (settings.ASR_WORKERS, 0 = the CPU cores divided by settings.WORKER_CONCURRENCY);
+    anything shorter, or a single worker, goes through the resident model in one call. Word timings are included when
+    `word_timestamps` (settings.ASR_WORD_TIMESTAMPS by default) is set.
+    """
+    if word_timestamps is None:
+        word_timestamps = settings.ASR_WORD_TIMESTAMPS
+    pcm = load_asr_pcm(audio_path)
+    duration = len(pcm) / ASR_SAMPLE_RATE
+    # Every concurrent task of the worker may be transcribing, so by default each gets its
+    # share of the cores rather than all of them
+    workers = workers or settings.ASR_WORKERS or max(1, (os.cpu_count() or 1) // settings.WORKER_CONCURRENCY)
+    chunks = split_at_pauses(pcm, settings.ASR_CHUNK_SECONDS)
+    workers = min(workers, len(chunks))
+
+    if workers <= 1 or duration < settings.ASR_CHUNKED_MIN_SECONDS:
+        logger.info(f"Transcribing {duration:.0f}s of audio in one pass")
+        return transcribe_chunk(pcm, 0.0, word_timestamps=word_timestamps)
+
+    logger.info(f"Transcribing {duration:.0f}s of audio as {len(chunks)} chunks on {workers} processes")
+    # Torch threads are split the same way, between this task's processes
+    threads = max(1, (os.cpu_count() or 1) // (workers * settings.WORKER_CONCURRENCY))
+    # spawn, not fork: the Celery worker is multi-threaded
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_asr_worker, initargs=(threads,)) as pool:
+        futures = [
+            pool.submit(transcribe_chunk, pcm[start:end], start / ASR_SAMPLE_RATE, settings.WHISPER_MODEL,
+                        word_timestamps)
+            for start, end in chunks
+        ]
+        return [segment for future in futures for segment in future.result()]
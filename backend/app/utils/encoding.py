@@ -0,0 +1,93 @@
+# backend/app/utils/encoding.py
+
+import enum
+import logging
+import os
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class EncodingProfile(str, enum.Enum):
+    DRAFT = "draft"
+    STANDARD = "standard"
+    ARCHIVE = "archive"
+
+# Each of the worker's concurrent tasks encodes with its share of the cores
+_TASK_THREADS = max(1, (os.cpu_count() or 1) // settings.WORKER_CONCURRENCY)
+
+# Video encoder settings per profile
+ENCODING_PROFILES = {
+    # Fastest turnaround, larger files
+    EncodingProfile.DRAFT: {
+        'codec': 'libx264',
+        'preset': 'ultrafast',
+        'crf': 28,
+        'tune': 'fastdecode',
+        'threads': _TASK_THREADS,
+    },
+    # The previous fixed behaviour: libx264 defaults
+    EncodingProfile.STANDARD: {
+        'codec': 'libx264',
+        'preset': 'medium',
+        'crf': 23,
+        'tune': None,
+        'threads': _TASK_THREADS,
+    },
+    # Smallest files, slowest encode
+    EncodingProfile.ARCHIVE: {
+        'codec': 'libx265',
+        'preset': 'slow',
+        'crf': 24,
+        'tune': None,
+        # x265 pipelines frames across threads and stalls badly on a single one
+        'threads': max(2, _TASK_THREADS),
+    },
+}
+
+def profile_for_plan(plan) -> EncodingProfile:
+    """Default encoding profile for a user's SubscriptionPlan."""
+    from app.models.user import SubscriptionPlan
+    if plan == SubscriptionPlan.premium:
+        return EncodingProfile.STANDARD
+    return EncodingProfile.DRAFT
+
+def allowed_profiles(plan) -> tuple:
+    """Profiles a SubscriptionPlan may request: premium any, other plans only their default."""
+    from app.models.user import SubscriptionPlan
+    if plan == SubscriptionPlan.premium:
+        return tuple(EncodingProfile)
+    return (profile_for_plan(plan),)
+
+def resolve_encoding_profile(requested: str = None, plan=None) -> EncodingProfile:
+    """A requested profile is used if the plan allows it; otherwise the plan's default is."""
+    default = profile_for_plan(plan)
+    if requested:
+        profile = EncodingProfile(requested)
+        if profile in allowed_profiles(plan):
+            return profile
+        logger.warning(f"Encoding profile {profile.value} is not available on plan {plan}; using {default.value}")
+    return default
+
+def video_encoder_args(profile: str = EncodingProfile.STANDARD, threads: int = None) -> list:
+    """
+    ffmpeg output options for the video stream of `profile`.
+
+    `threads` overrides the profile's thread count, e.g. for segment workers that share
+    the machine with each other.
+    """
+    encoder = ENCODING_PROFILES[EncodingProfile(profile)]
+    args = [
+        "-c:v", encoder['codec'],
+        "-preset", encoder['preset'],
+        "-crf", str(encoder['crf']),
+        "-pix_fmt", "yuv420p",
+    ]
+    if encoder['tune']:
+        args += ["-tune", encoder['tune']]
+    threads = threads or encoder['threads']
+    if threads:
+        args += ["-threads", str(threads)]
+    if encoder['codec'] == 'libx265':
+        # Lets Apple players recognise HEVC in .mp4
+        args += ["-tag:v", "hvc1"]
+    return args
@@ -0,0 +1,238 @@
+# backend/app/utils/face_inference.py
+
+import logging
+import cv2
+import numpy as np
+from app.config import settings
+from insightface.app.common import Face
+from insightface.data import get_image
+from insightface.model_zoo.retinaface import distance2bbox, distance2kps
+from insightface.utils import face_align
+
+logger = logging.getLogger(__name__)
+
+# Faces smaller than this share of the largest face in their frame are background faces
+PROMINENT_FACE_RATIO = 0.2
+
+# Square detector input sizes tried, smallest first; the prepared size caps them
+DET_SIZES = (320, 480, 640)
+# Face height in detector input pixels that SCRFD still finds reliably
+MIN_DETECTABLE_FACE_PX = 24
+
+def det_sizes_for(det_model, frame_w: int, frame_h: int, face_height_ratio: float = None) -> list:
+    """
+    Detector input sizes to try for a frame, in order.
+
+    The first is the smallest size at which a face `face_height_ratio` of the frame height
+    (settings.FACE_MIN_FACE_RATIO by default) is still MIN_DETECTABLE_FACE_PX tall once
+    the frame is fitted into the input; the rest are the larger sizes to retry with when
+    nothing is found. Models exported with a fixed input size only have that size.
+    """
+    prepared = det_model.input_size[0]
+    if isinstance(det_model.input_shape[2], int):
+        return [prepared]
+    face_height_ratio = face_height_ratio or settings.FACE_MIN_FACE_RATIO
+    needed = MIN_DETECTABLE_FACE_PX * max(frame_w, frame_h) / (face_height_ratio * frame_h)
+    sizes = [size for size in DET_SIZES if size < prepared] + [prepared]
+    first = next((i for i, size in enumerate(sizes) if size >= needed), len(sizes) - 1)
+    return sizes[first:]
+
+def _letterbox(frame: np.ndarray, input_size: tuple) -> tuple:
+    """Fit `frame` into the detector input the way SCRFD.detect does; returns (image, scale)."""
+    input_w, input_h = input_size
+    im_ratio = frame.shape[0] / frame.shape[1]
+    if im_ratio > input_h / input_w:
+        new_h = input_h
+        new_w = int(new_h / im_ratio)
+    else:
+        new_w = input_w
+        new_h = int(new_w * im_ratio)
+    det_img = np.zeros((input_h, input_w, 3), dtype=np.uint8)
+    det_img[:new_h, :new_w] = cv2.resize(frame, (new_w, new_h))
+    return det_img, new_h / frame.shape[0]
+
+def _anchor_centers(det_model, height: int, width: int, stride: int) -> np.ndarray:
+    key = (height, width, stride)
+    if key not in det_model.center_cache:
+        centers = np.stack(np.mgrid[:height, :width][::-1], axis=-1).astype(np.float32)
+        centers = (centers * stride).reshape((-1, 2))
+        if det_model._num_anchors > 1:
+            centers = np.stack([centers] * det_model._num_anchors, axis=1).reshape((-1, 2))
+        if len(det_model.center_cache) < 100:
+            det_model.center_cache[key] = centers
+        return centers
+    return det_model.center_cache[key]
+
+def _decode_detections(det_model, outputs: list, input_h: int, input_w: int, det_scale: float) -> tuple:
+    """Detector post-processing for one image's outputs: (bboxes with scores, keypoints or None)."""
+    fmc = det_model.fmc
+    scores_list, bboxes_list, kpss_list = [], [], []
+    for idx, stride in enumerate(det_model._feat_stride_fpn):
+        scores = outputs[idx]
+        bbox_preds = outputs[idx + fmc] * stride
+        centers = _anchor_centers(det_model, input_h // stride, input_w // stride, stride)
+
+        pos_inds = np.where(scores >= det_model.det_thresh)[0]
+        scores_list.append(scores[pos_inds])
+        bboxes_list.append(distance2bbox(centers, bbox_preds)[pos_inds])
+        if det_model.use_kps:
+            kps_preds = outputs[idx + fmc * 2] * stride
+            kpss = distance2kps(centers, kps_preds).reshape((-1, 5, 2))
+            kpss_list.append(kpss[pos_inds])
+
+    scores = np.vstack(scores_list)
+    order = scores.ravel().argsort()[::-1]
+    bboxes = np.vstack(bboxes_list) / det_scale
+    pre_det = np.hstack((bboxes, scores)).astype(np.float32, copy=False)[order, :]
+    keep = det_model.nms(pre_det)
+    kpss = None
+    if det_model.use_kps:
+        kpss = (np.vstack(kpss_list) / det_scale)[order, :, :][keep, :, :]
+    return pre_det[keep, :], kpss
+
+def detect_batch(det_model, frames: list, input_size: tuple = None) -> list:
+    """
+    Run the detector of a prepared FaceAnalysis (RetinaFace or SCRFD) over `frames` in
+    one inference.
+
+    Returns one (bboxes with scores, keypoints or None) pair per frame, the same as
+    det_model.detect would for each frame on its own. Boxes are in frame coordinates
+    whatever the `input_size` (the prepared size by default).
+    """
+    input_size = input_size or det_model.input_size
+    letterboxed = [_letterbox(frame, input_size) for frame in frames]
+    blob = cv2.dnn.blobFromImages(
+        [det_img for det_img, _ in letterboxed], 1.0 / det_model.input_std, input_size,
+        (det_model.input_mean, det_model.input_mean, det_model.input_mean), swapRB=True
+    )
+    net_outs = det_model.session.run(det_model.output_names, {det_model.input_name: blob})
+
+    # Batched exports keep a leading batch axis (rank-3 outputs); the others flatten the
+    # batch into the anchor axis in batch order, so it splits back evenly. RetinaFace,
+    # which buffalo_l's det_10g loads as, has no `batched` attribute to ask.
+    if net_outs[0].ndim == 3:
+        per_image = [[out[b] for out in net_outs] for b in range(len(frames))]
+    else:
+        split = [np.split(out, len(frames)) for out in net_outs]
+        per_image = [[out[b] for out in split] for b in range(len(frames))]
+
+    input_h, input_w = blob.shape[2:]
+    return [
+        _decode_detections(det_model, outputs, input_h, input_w, det_scale)
+        for outputs, (_, det_scale) in zip(per_image, letterboxed)
+    ]
+
+def embed_faces(rec_model, crops: list, batch_size: int) -> np.ndarray:
+    """ArcFace embeddings of aligned face crops, `batch_size` crops per inference."""
+    feats = [rec_model.get_feat(crops[i:i + batch_size]) for i in range(0, len(crops), batch_size)]
+    return np.vstack(feats)
+
+def prominent_faces(faces: list, min_ratio: float = PROMINENT_FACE_RATIO) -> list:
+    """Faces whose box is at least `min_ratio` of the largest face's area, in detection order."""
+    if not faces:
+        return []
+    areas = [(face.bbox[2] - face.bbox[0]) * (face.bbox[3] - face.bbox[1]) for face in faces]
+    threshold = max(areas) * min_ratio
+    return [face for face, area in zip(faces, areas) if area >= threshold]
+
+def _to_faces(bboxes: np.ndarray, kpss: np.ndarray) -> list:
+    return [
+        Face(bbox=bboxes[i, :4], kps=kpss[i] if kpss is not None else None, det_score=bboxes[i, 4])
+        for i in range(bboxes.shape[0])
+    ]
+
+def detect_faces(face_analysis, frame: np.ndarray) -> list:
+    """
+    Faces in one frame with boxes and landmarks only; no embeddings are computed.
+
+    Detection starts at the input size chosen by det_sizes_for and retries larger ones
+    while nothing is found.
+    """
+    det_model = face_analysis.det_model
+    faces = []
+    for size in det_sizes_for(det_model, frame.shape[1], frame.shape[0]):
+        bboxes, kpss = det_model.detect(frame, input_size=(size, size), max_num=0, metric='default')
+        faces = _to_faces(bboxes, kpss)
+        if faces:
+            break
+    return faces
+
+def batched_detection_matches(face_analysis, frame: np.ndarray = None, tolerance: float = 1.0) -> bool:
+    """
+    Whether detect_batch finds the same boxes as `face_analysis.get` on a sample frame
+    (InsightFace's bundled 't1' group photo by default), with the frame batched twice.
+    """
+    if frame is None:
+        frame = get_image('t1')
+    expected = sorted(face.bbox.tolist() for face in face_analysis.get(frame))
+    for bboxes, _ in detect_batch(face_analysis.det_model, [frame, frame]):
+        actual = sorted(bbox[:4].tolist() for bbox in bboxes)
+        if len(actual) != len(expected) or not np.allclose(actual, expected, atol=tolerance):
+            logger.warning(f"Batched face detection found {len(actual)} faces where "
+                           f"FaceAnalysis.get found {len(expected)}")
+            return False
+    return True
+
+def _detect_frames(face_analysis, frames: list, batch_size: int) -> list:
+    """
+    Detection with the det_sizes_for retries; one (bboxes, kpss) pair per frame.
+
+    Frames go through detect_batch only when batched_detection_matches accepted it for
+    this FaceAnalysis (see `batched_detection`); otherwise each frame goes through the
+    detector's own detect.
+    """
+    det_model = face_analysis.det_model
+    sizes = det_sizes_for(det_model, frames[0].shape[1], frames[0].shape[0])
+    batched = getattr(face_analysis, 'batched_detection', False)
+    det_batch = batch_size if det_model.input_shape[0] != 1 else 1
+
+    detections = [None] * len(frames)
+    pending = list(range(len(frames)))
+    for size in sizes:
+        if batched:
+            for i in range(0, len(pending), det_batch):
+                batch = pending[i:i + det_batch]
+                results = detect_batch(det_model, [frames[j] for j in batch], (size, size))
+                for j, result in zip(batch, results):
+                    detections[j] = result
+        else:
+            for j in pending:
+                detections[j] = det_model.detect(frames[j], input_size=(size, size), max_num=0, metric='default')
+        # Frames without a face get another look at the next size up
+        pending = [j for j in pending if detections[j][0].shape[0] == 0]
+        if not pending:
+            break
+    return detections
+
+def analyze_frames(face_analysis, frames: list, batch_size: int = 16, min_face_ratio: float = None) -> list:
+    """
+    Batched equivalent of calling `face_analysis.get(frame)` on every frame.
+
+    Detection runs over the frames `batch_size` at a time at the input size chosen by
+    det_sizes_for, retrying larger sizes for frames where nothing was found. The faces
+    of all frames are then aligned and embedded together in batches of `batch_size`.
+    Returns a list of Face lists, one per frame.
+
+    With `min_face_ratio`, faces smaller than that share of each frame's largest face are
+    dropped before recognition, so they never cost an embedding. Detectors exported with
+    a fixed batch of one, or whose batched output failed batched_detection_matches, fall
+    back to one frame per detection inference; recognition always batches.
+    """
+    detections = _detect_frames(face_analysis, frames, batch_size)
+    faces_per_frame = [_to_faces(bboxes, kpss) for bboxes, kpss in detections]
+    if min_face_ratio:
+        faces_per_frame = [prominent_faces(faces, min_face_ratio) for faces in faces_per_frame]
+
+    rec_model = face_analysis.models.get('recognition')
+    if rec_model is not None:
+        crops, owners = [], []
+        for frame, faces in zip(frames, faces_per_frame):
+            for face in faces:
+                crops.append(face_align.norm_crop(frame, landmark=face.kps, image_size=rec_model.input_size[0]))
+                owners.append(face)
+        if crops:
+            for face, embedding in zip(owners, embed_faces(rec_model, crops, batch_size)):
+                face.embedding = embedding.flatten()
+
+    logger.debug(f"Analysed {len(frames)} frames: {sum(len(f) for f in faces_per_frame)} faces")
+    return faces_per_frame
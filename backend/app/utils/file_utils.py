@@ -1 +1,11 @@
-# backend/app/utils/file_utils.py
\ No newline at end of file
+# backend/app/utils/file_utils.py
+
+import hashlib
+
+def file_sha256(path: str) -> str:
+    """Hex sha256 of a file, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
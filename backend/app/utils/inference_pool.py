@@ -0,0 +1,95 @@
+# backend/app/utils/inference_pool.py
+
+import logging
+import os
+import threading
+from contextlib import contextmanager
+import onnxruntime
+
+logger = logging.getLogger(__name__)
+
+def onnx_session_options(intra_op_threads: int) -> onnxruntime.SessionOptions:
+    """
+    SessionOptions for one of several sessions sharing the machine.
+
+    Each session gets `intra_op_threads` threads for a single operator and runs the graph
+    sequentially, so sessions used at the same time add up to at most the core count
+    instead of each starting a thread per core.
+    """
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = 1
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    # The intra-op threads yield their core instead of spinning between runs
+    options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    return options
+
+class InferenceSessionPool:
+    """
+    Thread-safe pool of up to `size` model instances built by `factory(session_options)`.
+
+    Instances are created on first demand, so a worker that never runs more than a few
+    tasks at once never loads more than a few copies, unless `prefill` creates them all
+    up front. Each is built with
+    onnx_session_options for cpu_count // size threads, so a pool sized to the worker's
+    concurrency keeps a fully loaded worker at one inference thread per core. When all
+    instances are in use, `acquire` blocks until one is released.
+    """
+
+    def __init__(self, factory, size: int, name: str = "inference"):
+        self.factory = factory
+        self.size = max(1, size)
+        self.name = name
+        self.intra_op_threads = max(1, (os.cpu_count() or 1) // self.size)
+        self._idle = []
+        self._created = 0
+        # Signalled whenever an instance is released or a slot frees up after a failed create
+        self._available = threading.Condition()
+
+    def acquire(self):
+        """Check out an instance; give it back with `release`."""
+        with self._available:
+            while not self._idle and self._created >= self.size:
+                self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+
+        logger.info(f"Creating {self.name} session {self._created}/{self.size} "
+                    f"with {self.intra_op_threads} intra-op threads")
+        try:
+            return self.factory(onnx_session_options(self.intra_op_threads))
+        except Exception:
+            # Give the slot back and wake a waiter, which may then try creating it again
+            with self._available:
+                self._created -= 1
+                self._available.notify()
+            raise
+
+    def prefill(self) -> int:
+        """Create every instance not created yet, e.g. at worker start; returns how many."""
+        instances = []
+        try:
+            while True:
+                with self._available:
+                    if self._created >= self.size:
+                        break
+                instances.append(self.acquire())
+        finally:
+            for instance in instances:
+                self.release(instance)
+        return len(instances)
+
+    def release(self, instance):
+        with self._available:
+            self._idle.append(instance)
+            self._available.notify()
+
+    @contextmanager
+    def checkout(self):
+        """Context manager form of acquire/release."""
+        instance = self.acquire()
+        try:
+            yield instance
+        finally:
+            self.release(instance)
@@ -0,0 +1,260 @@
+# backend/app/utils/model_registry.py
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from app.config import settings
+from app.utils.file_utils import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Model weights in settings.MODEL_DIR, as paths relative to it. The layout is the one the
+# libraries expect: InsightFace looks in <root>/models/<name>, Whisper takes a checkpoint.
+# Whisper's entry follows settings.WHISPER_MODEL, whichever size it is.
+MODEL_ARTIFACTS = {
+    'buffalo_l': 'insightface/models/buffalo_l',
+    f'whisper-{settings.WHISPER_MODEL}': f'whisper/{settings.WHISPER_MODEL}.pt',
+}
+
+# sha256 of every artifact file, written by `python -m workers.model_manifest`
+MANIFEST_FILE = "manifest.json"
+
+# Seconds each model took to load in this process, by model name
+load_times = {}
+
+_verified = set()
+
+def artifact_path(name: str) -> str:
+    return os.path.join(settings.MODEL_DIR, MODEL_ARTIFACTS[name])
+
+def artifact_files(name: str) -> list:
+    """Files of an artifact, relative to settings.MODEL_DIR and sorted."""
+    path = artifact_path(name)
+    if os.path.isfile(path):
+        return [MODEL_ARTIFACTS[name]]
+    files = []
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            files.append(os.path.relpath(os.path.join(dirpath, filename), settings.MODEL_DIR))
+    return sorted(files)
+
+def load_manifest() -> dict:
+    manifest_path = os.path.join(settings.MODEL_DIR, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def local_artifact(name: str) -> str:
+    """
+    Path of a model's verified local artifact, or None to let the library download it.
+
+    Every file listed for the model in the manifest must exist with its recorded sha256;
+    a mismatch raises rather than loading tampered or truncated weights. Without a local
+    artifact, settings.MODELS_OFFLINE turns the download fallback into an error; that
+    includes models that have no entry in MODEL_ARTIFACTS at all.
+    """
+    if name not in MODEL_ARTIFACTS:
+        if settings.MODELS_OFFLINE:
+            raise FileNotFoundError(f"Model {name} has no local artifact and MODELS_OFFLINE is set")
+        logger.warning(f"Model {name} has no local artifact; falling back to download")
+        return None
+    path = artifact_path(name)
+    if not os.path.exists(path):
+        if settings.MODELS_OFFLINE:
+            raise FileNotFoundError(f"Model artifact {name} not found at {path} and MODELS_OFFLINE is set")
+        logger.warning(f"Model artifact {name} not found at {path}; falling back to download")
+        return None
+    if name in _verified:
+        return path
+
+    checksums = load_manifest().get(name)
+    if not checksums:
+        raise RuntimeError(f"Model artifact {name} has no checksums in {MANIFEST_FILE}")
+    for relpath, expected in checksums.items():
+        file_path = os.path.join(settings.MODEL_DIR, relpath)
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Model artifact file {relpath} is missing")
+        actual = file_sha256(file_path)
+        if actual != expected:
+            raise RuntimeError(f"Checksum mismatch for {relpath}: expected {expected}, got {actual}")
+
+    _verified.add(name)
+    logger.info(f"Verified {len(checksums)} file(s) of model artifact {name}")
+    return path
+
+def insightface_root() -> str:
+    """`root` for FaceAnalysis: the local artifact directory, or InsightFace's default."""
+    if local_artifact('buffalo_l'):
+        return os.path.join(settings.MODEL_DIR, 'insightface')
+    return os.path.expanduser('~/.insightface')
+
+@contextmanager
+def timed_load(name: str):
+    """Record and log how long loading `name` takes."""
+    started = time.perf_counter()
+    yield
+    load_times[name] = time.perf_counter() - started
+    logger.info(f"Loaded model {name} in {load_times[name]:.2f}s")
+
+class _CachedModel:
+    def __init__(self):
+        self.model = None  # Loaded by the first use, under `lock`
+        self.lock = threading.Lock()  # Held for each use; see WhisperModelCache.use
+        self.users = 0
+        self.last_used = time.monotonic()
+
+class WhisperModelCache:
+    """
+    Process-wide Whisper models keyed by (model name, device).
+
+    At most `capacity` models stay resident; loading another evicts the least recently
+    used one that is not in use, and when all of them are in use the task waits for one
+    to be released. Models left unused for `idle_seconds` are unloaded by a background
+    sweeper. Whisper's decoder installs its kv-cache hooks on the model itself, so tasks
+    sharing a model take turns on it rather than transcribing at once. A model loads
+    under its own lock, so the others stay usable meanwhile.
+    """
+
+    def __init__(self, capacity: int, idle_seconds: float):
+        self.capacity = max(1, capacity)
+        self.idle_seconds = idle_seconds
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._sweeper = None
+
+    @staticmethod
+    def _device(device: str = None) -> str:
+        if device or settings.WHISPER_DEVICE:
+            return device or settings.WHISPER_DEVICE
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+
+    def _load(self, name: str, device: str):
+        import whisper
+
+        key = f"whisper-{name}"
+        checkpoint = local_artifact(key)
+        with timed_load(key):
+            return whisper.load_model(checkpoint or name, device=device)
+
+    def _evict(self):
+        # Called with self._lock held
+        for key in list(self._models):
+            if len(self._models) < self.capacity:
+                break
+            if self._models[key].users == 0:
+                logger.info(f"Evicting Whisper model {key} from the cache")
+                del self._models[key]
+
+    def _entry(self, name: str, device: str) -> _CachedModel:
+        key = (name, device)
+        with self._lock:
+            entry = self._models.get(key)
+            while entry is None:
+                self._evict()
+                if len(self._models) < self.capacity:
+                    entry = _CachedModel()
+                    self._models[key] = entry
+                    break
+                logger.info(f"All {self.capacity} cached Whisper models are in use; waiting to load {key}")
+                self._released.wait()
+                entry = self._models.get(key)
+            self._models.move_to_end(key)
+            entry.users += 1
+            self._start_sweeper()
+            return entry
+
+    @contextmanager
+    def use(self, name: str = None, device: str = None):
+        """`with whisper_models.use() as model:` - the resident model, loaded on first use."""
+        name = name or settings.WHISPER_MODEL
+        device = self._device(device)
+        entry = self._entry(name, device)
+        try:
+            with entry.lock:
+                # Concurrent first uses wait here for the one loading the model
+                if entry.model is None:
+                    entry.model = self._load(name, device)
+                yield entry.model
+        finally:
+            with self._lock:
+                entry.users -= 1
+                entry.last_used = time.monotonic()
+                self._released.notify_all()
+
+    def preload(self, name: str = None, device: str = None):
+        with self.use(name, device):
+            pass
+
+    def unload_idle(self):
+        """Drop models unused for idle_seconds; returns how many were unloaded."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [key for key, entry in self._models.items()
+                    if entry.users == 0 and now - entry.last_used >= self.idle_seconds]
+            for key in idle:
+                logger.info(f"Unloading Whisper model {key} after {self.idle_seconds:.0f}s idle")
+                del self._models[key]
+        if idle and any(device == "cuda" for _, device in idle):
+            import torch
+            torch.cuda.empty_cache()
+        return len(idle)
+
+    def _start_sweeper(self):
+        # Called with self._lock held
+        if self._sweeper is not None or not self.idle_seconds:
+            return
+
+        def _sweep():
+            while True:
+                time.sleep(min(self.idle_seconds, 60))
+                try:
+                    self.unload_idle()
+                except Exception as e:
+                    logger.error(f"Whisper cache sweep failed: {e}", exc_info=True)
+
+        self._sweeper = threading.Thread(target=_sweep, name="whisper-cache-sweeper", daemon=True)
+        self._sweeper.start()
+
+whisper_models = WhisperModelCache(settings.WHISPER_CACHE_SIZE, settings.WHISPER_IDLE_SECONDS)
+
+def warm_models():
+    """
+    Load and exercise the models tasks use, so the first task does not pay for it.
+
+    Called when a worker process starts. Failures are logged, not raised: the task that
+    needs a model will load it again and fail on its own if it still cannot.
+    """
+    import numpy as np
+    from app.services.face_detection import get_face_detector_pool
+    from app.utils.face_inference import detect_faces
+
+    started = time.perf_counter()
+    try:
+        # Every slot is created now, so a burst of concurrent tasks finds them all loaded
+        pool = get_face_detector_pool()
+        pool.prefill()
+        face_detectors = [pool.acquire() for _ in range(pool.size)]
+        try:
+            for face_detector in face_detectors:
+                # One inference allocates onnxruntime's buffers too
+                detect_faces(face_detector, np.zeros((360, 640, 3), dtype=np.uint8))
+        finally:
+            for face_detector in face_detectors:
+                pool.release(face_detector)
+    except Exception as e:
+        logger.error(f"Warming up the face detector failed: {e}", exc_info=True)
+
+    try:
+        whisper_models.preload()
+    except Exception as e:
+        logger.error(f"Warming up Whisper failed: {e}", exc_info=True)
+
+    logger.info(f"Model warmup finished in {time.perf_counter() - started:.2f}s: "
+                + ", ".join(f"{name}={seconds:.2f}s" for name, seconds in load_times.items()))
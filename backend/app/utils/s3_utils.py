@@ -5,6 +5,11 @@ from botocore.exceptions import ClientError
 import os
 import re
 import logging
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
 from app.config import settings
 from fastapi import HTTPException
 
@@ -18,6 +23,10 @@ def get_s3_client():
         aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
     )
 
+def s3_url_for_key(s3_key: str) -> str:
+    """URL of an object in the configured bucket, in the form upload_file_to_s3 returns."""
+    return f"https://{settings.AWS_S3_BUCKET_NAME}.s3.amazonaws.com/{s3_key}"
+
 def upload_file_to_s3(local_path: str, s3_key: str) -> str:
     """
     Uploads a file to S3 and returns the S3 URL.
@@ -39,7 +48,7 @@ def upload_file_to_s3(local_path: str, s3_key: str) -> str:
         logger.error(f"Error uploading file to S3: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to upload file to S3.")
 
-    s3_url = f"https://{bucket}.s3.amazonaws.com/{s3_key}"
+    s3_url = s3_url_for_key(s3_key)
     logger.info(f"Successfully uploaded to S3. S3 URL: {s3_url}")
     return s3_url
 
@@ -71,4 +80,83 @@ def download_s3_to_local(s3_url: str, local_path: str):
         logger.info(f"Successfully downloaded {s3_url} to {local_path}")
     except ClientError as e:
         logger.error(f"Error downloading from S3: {e}", exc_info=True)
-        raise
\ No newline at end of file
+        raise
+
+def delete_file_from_s3(s3_url: str):
+    """
+    Delete an object previously uploaded with upload_file_to_s3.
+    s3_url expected like: https://my-bucket.s3.amazonaws.com/segments/12/segment_00000.mp4
+    """
+    s3_client = get_s3_client()
+
+    pattern = r"https://(.*)\.s3\.amazonaws\.com/(.*)"
+    match = re.match(pattern, s3_url)
+    if not match:
+        logger.error(f"S3 URL {s3_url} not in expected format.")
+        raise ValueError(f"URL {s3_url} is not in expected S3 format")
+
+    bucket = match.group(1)
+    key = match.group(2)
+
+    logger.info(f"Deleting s3://{bucket}/{key}")
+    try:
+        s3_client.delete_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        logger.error(f"Error deleting from S3: {e}", exc_info=True)
+        raise
+
+class _LocalCopy:
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()  # Held while downloading
+        self.ready = False
+        self.users = 0
+
+class S3DownloadCache:
+    """
+    Local copies of S3 objects shared by the tasks of one worker process.
+
+    The first task asking for an object downloads it while later ones wait for that
+    download instead of starting their own. Copies no task is using are deleted, least
+    recently used first, once more than `capacity` are on disk.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._copies = OrderedDict()
+        self._lock = threading.Lock()
+        self._dir = None
+
+    def _evict(self):
+        # Called with self._lock held
+        for s3_url in list(self._copies):
+            if len(self._copies) <= self.capacity:
+                break
+            copy = self._copies[s3_url]
+            if copy.users == 0:
+                del self._copies[s3_url]
+                delete_local_file(copy.path)
+
+    @contextmanager
+    def local_copy(self, s3_url: str):
+        """`with cache.local_copy(url) as path:` - the object's local path, downloaded once."""
+        with self._lock:
+            if self._dir is None:
+                self._dir = tempfile.mkdtemp(prefix="s3-cache-")
+            copy = self._copies.get(s3_url)
+            if copy is None:
+                _, ext = os.path.splitext(s3_url)
+                copy = _LocalCopy(os.path.join(self._dir, f"{uuid.uuid4().hex}{ext}"))
+                self._copies[s3_url] = copy
+            self._copies.move_to_end(s3_url)
+            copy.users += 1
+        try:
+            with copy.lock:
+                if not copy.ready:
+                    download_s3_to_local(s3_url, copy.path)
+                    copy.ready = True
+            yield copy.path
+        finally:
+            with self._lock:
+                copy.users -= 1
+                self._evict()
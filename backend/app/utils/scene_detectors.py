@@ -0,0 +1,393 @@
+# backend/app/utils/scene_detectors.py
+
+import cv2
+import enum
+import numpy as np
+import logging
+import re
+import subprocess
+from collections import deque
+from app.config import settings
+from app.utils.video_utils import iter_frames, probe_video_packets
+
+logger = logging.getLogger(__name__)
+
+class SceneEngine(str, enum.Enum):
+    MEAN_DIFF = "mean_diff"
+    HISTOGRAM = "histogram"
+    ADAPTIVE = "adaptive"
+    SCDET = "scdet"
+    COMPRESSED = "compressed"
+
+# Engines that find all cuts up front instead of judging decoded frames
+PRECOMPUTED_ENGINES = {SceneEngine.SCDET, SceneEngine.COMPRESSED}
+
+def scene_detector_key(engine: str = None) -> str:
+    """
+    Identifies an engine and the settings that affect its cuts, so stored scenes are only
+    reused for the same detector.
+    """
+    engine = SceneEngine(engine or settings.SCENE_DETECTION_ENGINE)
+    if engine in PRECOMPUTED_ENGINES:
+        return engine.value
+    return f"{engine.value}:w{settings.SCENE_ANALYSIS_WIDTH}"
+
+def scene_changes_to_scenes(scene_changes: list, total_frames: int, fps: float) -> list:
+    """Convert scene start frames to (start_time, end_time) tuples."""
+    scene_changes = scene_changes + [total_frames]
+    scenes = []
+    for i in range(len(scene_changes) - 1):
+        start_time = scene_changes[i] / fps
+        end_time = scene_changes[i + 1] / fps
+        scenes.append((start_time, end_time))
+    return scenes
+
+class SceneDetector:
+    """
+    Incremental cut detector fed one frame at a time.
+
+    Cuts only depend on frames already seen, so a consumer that runs after the detector
+    in the same decode pass knows on each frame whether that frame starts a new scene.
+    Engines implement `is_cut(frame_count, frame)`, the raw decision for one frame, which
+    is called for every frame in order; a cut closer than `min_scene_seconds` to the
+    previous one is then ignored.
+    """
+
+    # Frames before a given one that is_cut must have seen to judge it as it would in a
+    # full pass; lets a detector start in the middle of a video
+    warmup_frames = 1
+    # Whether is_cut looks at decoded frames at all
+    decodes_frames = True
+
+    def __init__(self, fps: float, min_scene_seconds: float = 1.0, rgb: bool = True):
+        self.fps = fps
+        self.min_scene_length = int(fps * min_scene_seconds)  # Minimum frames per scene
+        self.rgb = rgb
+        self.scene_changes = [0]  # Start with first frame
+
+    @property
+    def current_scene_start(self) -> int:
+        return self.scene_changes[-1]
+
+    def is_cut(self, frame_count: int, frame: np.ndarray) -> bool:
+        raise NotImplementedError
+
+    def __call__(self, frame_count: int, frame: np.ndarray):
+        if (self.is_cut(frame_count, frame) and
+            (frame_count - self.scene_changes[-1]) > self.min_scene_length):
+            self.scene_changes.append(frame_count)
+            logger.info(f"Scene change detected at frame {frame_count} "
+                      f"(time: {frame_count/self.fps:.2f}s)")
+
+    def scenes(self, total_frames: int) -> list:
+        """Convert the detected cuts to (start_time, end_time) tuples."""
+        return scene_changes_to_scenes(self.scene_changes, total_frames, self.fps)
+
+class _DownscaledFrames:
+    """
+    Area-downscales frames to `analysis_width` into one reused buffer.
+
+    Frames already narrower than `analysis_width` (or with a width of 0) are passed through.
+    """
+
+    def __init__(self, analysis_width: int = None):
+        self.analysis_width = settings.SCENE_ANALYSIS_WIDTH if analysis_width is None else analysis_width
+        self.size = None  # (width, height) of the analysed plane, fixed on the first frame
+        self._small = None
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        if self.size is None:
+            frame_h, frame_w = frame.shape[:2]
+            if self.analysis_width and frame_w > self.analysis_width:
+                self.size = (self.analysis_width, max(1, round(frame_h * self.analysis_width / frame_w)))
+                self._small = np.empty((self.size[1], self.size[0], 3), dtype=np.uint8)
+            else:
+                self.size = (frame_w, frame_h)
+        if self._small is None:
+            return frame
+        cv2.resize(frame, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+        return self._small
+
+class MeanDiffDetector(SceneDetector):
+    """
+    Cuts where the mean absolute luma difference to the previous frame exceeds `threshold`.
+
+    Each frame is downscaled and converted to luma once, into preallocated buffers that
+    are swapped rather than copied between frames. A mean difference is an average, so it
+    barely moves under area downscaling and the threshold keeps its meaning.
+    """
+
+    def __init__(self, fps: float, threshold: float = 30.0, min_scene_seconds: float = 1.0, rgb: bool = True,
+                 analysis_width: int = None):
+        super().__init__(fps, min_scene_seconds, rgb)
+        self.threshold = threshold  # Threshold for scene change detection
+        self.gray_code = cv2.COLOR_RGB2GRAY if rgb else cv2.COLOR_BGR2GRAY
+        self._downscale = _DownscaledFrames(analysis_width)
+        self._curr = None
+        self._prev = None
+        self._diff = None
+        self._has_prev = False
+
+    def _frame_score(self, frame: np.ndarray) -> float:
+        """Mean luma difference to the previous frame, or None on the first frame."""
+        small = self._downscale(frame)
+        if self._curr is None:
+            self._curr = np.empty(small.shape[:2], dtype=np.uint8)
+            self._prev = np.empty_like(self._curr)
+            self._diff = np.empty_like(self._curr)
+        cv2.cvtColor(small, self.gray_code, dst=self._curr)
+
+        score = None
+        if self._has_prev:
+            cv2.absdiff(self._curr, self._prev, dst=self._diff)
+            score = cv2.mean(self._diff)[0]
+
+        # This frame's plane becomes the previous one; the old buffer is overwritten next
+        self._curr, self._prev = self._prev, self._curr
+        self._has_prev = True
+        return score
+
+    def is_cut(self, frame_count: int, frame: np.ndarray) -> bool:
+        score = self._frame_score(frame)
+        return score is not None and score > self.threshold
+
+class AdaptiveDetector(MeanDiffDetector):
+    """
+    Mean-diff detector whose threshold follows the recent motion level.
+
+    A frame is a cut when its score is at least `ratio` times the average score of the
+    preceding `window_seconds` and above `min_score`. Pans and fades raise the average
+    along with the score, so they do not fire; a hard cut stands out from either.
+    """
+
+    def __init__(self, fps: float, ratio: float = 3.0, min_score: float = 15.0, window_seconds: float = 0.5,
+                 min_scene_seconds: float = 1.0, rgb: bool = True, analysis_width: int = None):
+        super().__init__(fps, threshold=min_score, min_scene_seconds=min_scene_seconds, rgb=rgb,
+                         analysis_width=analysis_width)
+        self.ratio = ratio
+        self._window = deque(maxlen=max(2, int(fps * window_seconds)))
+        self._window_sum = 0.0
+        # The window must be full of real scores, each of which needs its previous frame
+        self.warmup_frames = self._window.maxlen + 1
+
+    def is_cut(self, frame_count: int, frame: np.ndarray) -> bool:
+        score = self._frame_score(frame)
+        if score is None:
+            return False
+
+        cut = False
+        if len(self._window) == self._window.maxlen:
+            average = self._window_sum / len(self._window)
+            cut = score > self.threshold and score >= self.ratio * max(average, 1.0)
+
+        if len(self._window) == self._window.maxlen:
+            self._window_sum -= self._window[0]
+        self._window.append(score)
+        self._window_sum += score
+        return cut
+
+class HistogramDetector(SceneDetector):
+    """
+    Cuts where the HSV colour histogram of a frame moves away from the previous one.
+
+    Histograms ignore where things are in the frame, so camera pans and people moving
+    within a shot barely change them, while a cut to another shot does. `threshold` is a
+    Bhattacharyya distance between 0 (identical) and 1.
+    """
+
+    def __init__(self, fps: float, threshold: float = 0.35, bins: tuple = (16, 8, 8), min_scene_seconds: float = 1.0,
+                 rgb: bool = True, analysis_width: int = None):
+        super().__init__(fps, min_scene_seconds, rgb)
+        self.threshold = threshold
+        self.bins = list(bins)
+        self.hsv_code = cv2.COLOR_RGB2HSV if rgb else cv2.COLOR_BGR2HSV
+        self._downscale = _DownscaledFrames(analysis_width)
+        self._hsv = None
+        self._prev_hist = None
+
+    def is_cut(self, frame_count: int, frame: np.ndarray) -> bool:
+        small = self._downscale(frame)
+        if self._hsv is None:
+            self._hsv = np.empty(small.shape, dtype=np.uint8)
+        cv2.cvtColor(small, self.hsv_code, dst=self._hsv)
+        hist = cv2.calcHist([self._hsv], [0, 1, 2], None, self.bins, [0, 180, 0, 256, 0, 256])
+        cv2.normalize(hist, hist, alpha=1.0, norm_type=cv2.NORM_L1)
+
+        cut = False
+        if self._prev_hist is not None:
+            cut = cv2.compareHist(self._prev_hist, hist, cv2.HISTCMP_BHATTACHARYYA) > self.threshold
+        self._prev_hist = hist
+        return cut
+
+class PrecomputedCutDetector(SceneDetector):
+    """
+    Replays cut frames found up front, so an engine that does not look at decoded frames
+    still works as a decode-pass consumer: each frame just looks up whether it is a cut.
+    """
+
+    warmup_frames = 0
+    decodes_frames = False
+
+    def __init__(self, fps: float, cut_frames: list, min_scene_seconds: float = 1.0, rgb: bool = True):
+        super().__init__(fps, min_scene_seconds, rgb)
+        self._cut_frames = set(cut_frames)
+
+    def is_cut(self, frame_count: int, frame: np.ndarray) -> bool:
+        return frame_count in self._cut_frames
+
+class FFmpegScdetDetector(PrecomputedCutDetector):
+    """
+    Cuts found by ffmpeg's `scdet` filter in a separate pass over `video_path`.
+    `threshold` is scdet's own 0-100 scene score.
+    """
+
+    def __init__(self, fps: float, video_path: str, threshold: float = 10.0, min_scene_seconds: float = 1.0,
+                 rgb: bool = True):
+        self.fps = fps
+        self.threshold = threshold
+        super().__init__(fps, self._run_scdet(video_path), min_scene_seconds, rgb)
+
+    def _run_scdet(self, video_path: str) -> list:
+        cmd = [
+            "ffmpeg", "-hide_banner", "-nostats", "-loglevel", "info",
+            "-i", video_path,
+            "-an", "-vf", f"scdet=threshold={self.threshold}",
+            "-f", "null", "-"
+        ]
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            logger.error(f"ffmpeg scdet failed: {result.stderr}")
+            raise RuntimeError("Failed to detect scenes via ffmpeg scdet.")
+        times = [float(t) for t in re.findall(r"lavfi\.scd\.time:\s*([\d.]+)", result.stderr)]
+        logger.info(f"ffmpeg scdet reported {len(times)} cuts in {video_path}")
+        return [round(t * self.fps) for t in times]
+
+def propose_cut_candidates(packets: list, fps: float, spike_ratio: float = 3.0, window_seconds: float = 2.0) -> list:
+    """
+    Frame numbers that may start a new shot, judged from packet metadata alone.
+
+    Encoders place keyframes at detected shot changes, and the first inter frame after a
+    cut is far larger than the motion-compensated frames before it. So every keyframe is
+    a candidate, and so is any packet at least `spike_ratio` times the median size of the
+    preceding `window_seconds`. Regular GOP keyframes are weeded out by confirm_cuts.
+    """
+    window = deque(maxlen=max(3, int(fps * window_seconds)))
+    candidates = []
+    for pts_time, size, is_keyframe in packets:
+        frame = round(pts_time * fps)
+        if frame > 0:
+            if is_keyframe:
+                candidates.append(frame)
+            elif len(window) == window.maxlen and size >= spike_ratio * float(np.median(window)):
+                candidates.append(frame)
+        # Keyframes are large by construction and would inflate the baseline
+        if not is_keyframe:
+            window.append(size)
+    return sorted(set(candidates))
+
+def _luma_difference(a: np.ndarray, b: np.ndarray, gray_code: int, analysis_width: int) -> float:
+    """Mean absolute luma difference of two frames, compared as MeanDiffDetector does."""
+    frame_h, frame_w = a.shape[:2]
+    if analysis_width and frame_w > analysis_width:
+        size = (analysis_width, max(1, round(frame_h * analysis_width / frame_w)))
+        a = cv2.resize(a, size, interpolation=cv2.INTER_AREA)
+        b = cv2.resize(b, size, interpolation=cv2.INTER_AREA)
+    return cv2.mean(cv2.absdiff(cv2.cvtColor(a, gray_code), cv2.cvtColor(b, gray_code)))[0]
+
+def confirm_cuts(video_path: str, candidates: list, threshold: float = 30.0, search_frames: int = 2,
+                 analysis_width: int = None) -> list:
+    """
+    Decode only the frames around each candidate and keep the real cuts.
+
+    A candidate's position from packet timestamps can be a frame or so off, so the
+    largest mean luma difference within `search_frames` of it decides, with the same
+    threshold as the mean_diff engine. Returns the confirmed cut frames.
+    """
+    analysis_width = settings.SCENE_ANALYSIS_WIDTH if analysis_width is None else analysis_width
+    vidcap = cv2.VideoCapture(video_path)
+    if not vidcap.isOpened():
+        raise RuntimeError(f"Could not open video file: {video_path}")
+
+    confirmed = []
+    try:
+        for candidate in candidates:
+            first = max(0, candidate - search_frames - 1)
+            vidcap.set(cv2.CAP_PROP_POS_FRAMES, first)
+            frames = []
+            for _ in range(first, candidate + search_frames + 1):
+                ret, frame = vidcap.read()
+                if not ret:
+                    break
+                frames.append(frame)
+
+            best_frame, best_score = None, 0.0
+            for i in range(1, len(frames)):
+                score = _luma_difference(frames[i - 1], frames[i], cv2.COLOR_BGR2GRAY, analysis_width)
+                if score > best_score:
+                    best_frame, best_score = first + i, score
+            if best_frame is not None and best_score > threshold:
+                confirmed.append(best_frame)
+    finally:
+        vidcap.release()
+
+    return sorted(set(confirmed))
+
+class CompressedDomainDetector(PrecomputedCutDetector):
+    """
+    Cuts proposed from packet sizes and keyframe positions and confirmed by decoding only
+    a few frames around each proposal. On long, mostly static videos this touches a small
+    fraction of the frames a decode-based engine has to.
+    """
+
+    def __init__(self, fps: float, video_path: str, threshold: float = 30.0, min_scene_seconds: float = 1.0,
+                 rgb: bool = True):
+        candidates = propose_cut_candidates(probe_video_packets(video_path), fps)
+        cut_frames = confirm_cuts(video_path, candidates, threshold=threshold)
+        logger.info(f"Confirmed {len(cut_frames)} of {len(candidates)} candidate cuts in {video_path}")
+        super().__init__(fps, cut_frames, min_scene_seconds, rgb)
+
+def create_scene_detector(engine: str, fps: float, video_path: str = None, rgb: bool = True) -> SceneDetector:
+    """Build the detector for `engine`, or for settings.SCENE_DETECTION_ENGINE when None."""
+    engine = SceneEngine(engine or settings.SCENE_DETECTION_ENGINE)
+    if engine == SceneEngine.HISTOGRAM:
+        return HistogramDetector(fps, rgb=rgb)
+    if engine == SceneEngine.ADAPTIVE:
+        return AdaptiveDetector(fps, rgb=rgb)
+    if engine == SceneEngine.SCDET:
+        if video_path is None:
+            raise ValueError("The scdet engine needs the video path.")
+        return FFmpegScdetDetector(fps, video_path, rgb=rgb)
+    if engine == SceneEngine.COMPRESSED:
+        if video_path is None:
+            raise ValueError("The compressed engine needs the video path.")
+        return CompressedDomainDetector(fps, video_path, rgb=rgb)
+    return MeanDiffDetector(fps, rgb=rgb)
+
+def apply_min_scene_length(cut_frames: list, min_scene_length: int) -> list:
+    """
+    Scene start frames, beginning with 0, from raw cut frames, dropping every cut within
+    `min_scene_length` frames of the previously kept one, as SceneDetector does.
+    """
+    scene_changes = [0]
+    for frame_count in sorted(cut_frames):
+        if frame_count - scene_changes[-1] > min_scene_length:
+            scene_changes.append(frame_count)
+    return scene_changes
+
+def find_raw_cuts(engine: str, video_path: str, fps: float, start_frame: int, end_frame: int) -> list:
+    """
+    Raw cut frames of `engine` in [start_frame, end_frame), before the minimum scene length.
+    An `end_frame` of None reads to the end of the video.
+
+    Decoding starts `warmup_frames` early so every frame in the range is judged exactly as
+    in a full sequential pass. Used as a process-pool worker.
+    """
+    detector = create_scene_detector(engine, fps, video_path, rgb=False)
+    first_frame = max(0, start_frame - detector.warmup_frames)
+    cuts = []
+    for frame_count, frame in iter_frames(video_path, rgb=False, start_frame=first_frame):
+        if end_frame is not None and frame_count >= end_frame:
+            break
+        if detector.is_cut(frame_count, frame) and frame_count >= start_frame:
+            cuts.append(frame_count)
+    return cuts
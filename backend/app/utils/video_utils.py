@@ -4,13 +4,24 @@ import os
 import cv2
 import numpy as np
 from PIL import Image
-from moviepy.editor import VideoFileClip, ImageSequenceClip
 import logging
 from datetime import datetime
 import subprocess
+import queue
+import threading
+import tempfile
+from app.config import settings
+from app.utils.encoding import EncodingProfile, video_encoder_args
 
 logger = logging.getLogger(__name__)
 
+# Size of the rendered vertical output
+OUTPUT_WIDTH = 1080
+OUTPUT_HEIGHT = 1920
+# Size of low-resolution preview renders, same aspect ratio
+PREVIEW_WIDTH = 360
+PREVIEW_HEIGHT = 640
+
 def ffprobe_info(video_path: str, label: str = ""):
     """Run ffprobe on the given video_path and log details."""
     try:
@@ -24,45 +35,212 @@ def ffprobe_info(video_path: str, label: str = ""):
     except Exception as e:
         logger.error(f"Error running ffprobe [{label}] on {video_path}: {e}")
 
-def extract_frames(video_path: str, frame_skip: int = 30) -> list:
-    logger.info(f"extract_frames called with video={video_path}, frame_skip={frame_skip}")
-    ffprobe_info(video_path, label="before extraction")
+# Audio codecs stream-copied into .mp4 outputs unchanged. Only those that browsers and
+# mobile players decode in .mp4 everywhere; everything else is re-encoded to AAC.
+MP4_COPYABLE_AUDIO_CODECS = {"aac", "mp3"}
+
+def probe_audio_codec(video_path: str) -> str:
+    """Return the codec name of the first audio stream, or None if there is none."""
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "stream=codec_name",
+        "-of", "default=noprint_wrappers=1:nokey=1", video_path
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    codec = result.stdout.strip()
+    return codec or None
+
+def audio_codec_args(audio_source: str) -> list:
+    """
+    ffmpeg audio codec options for muxing `audio_source` into an .mp4 output.
+
+    The source track is copied untouched when the container accepts its codec and only
+    re-encoded to AAC otherwise, so the audio is never decoded for nothing.
+    """
+    codec = probe_audio_codec(audio_source)
+    if codec in MP4_COPYABLE_AUDIO_CODECS:
+        logger.info(f"Passing through {codec} audio from {audio_source}")
+        return ["-c:a", "copy"]
+    logger.info(f"Re-encoding {codec} audio from {audio_source} to AAC")
+    return ["-c:a", "aac"]
+
+# Style overrides applied on top of the .ass template when burning in captions
+CAPTION_FORCE_STYLE = "Alignment=10,Outline=5,OutlineColour=&H000000,Shadow=3"
+
+def subtitles_filter(ass_path: str, start_time: float = 0.0) -> str:
+    """
+    Video filter that burns the captions of `ass_path` into the frames.
+
+    `start_time` is where the filtered stream starts on the source timeline, so a segment
+    rendered from the middle of a video still shows the captions of its own time range.
+    """
+    burn = f"subtitles=filename='{ass_path}':force_style='{CAPTION_FORCE_STYLE}'"
+    if start_time:
+        # Shift onto the source timeline for the burn and back to zero for the encoder
+        return f"setpts=PTS+{start_time:.6f}/TB,{burn},setpts=PTS-STARTPTS"
+    return burn
+
+def cut_leading_clip(input_path: str, output_path: str, seconds: float) -> str:
+    """Copy the first `seconds` of `input_path` to `output_path` without re-encoding."""
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-i", input_path,
+        "-t", f"{seconds}",
+        "-c", "copy",
+        output_path
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        logger.error(f"ffmpeg clip cut failed: {result.stderr}")
+        raise RuntimeError("Failed to cut clip via ffmpeg.")
+    return output_path
+
+def extract_asr_audio(video_path: str, output_path: str) -> str:
+    """
+    Write the first audio track of `video_path` as 16 kHz mono FLAC, the format Whisper
+    resamples everything to, so transcription never demuxes the video itself.
+    """
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-i", video_path,
+        "-map", "0:a:0", "-vn",
+        "-ac", "1", "-ar", "16000",
+        "-c:a", "flac",
+        output_path
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        logger.error(f"ffmpeg audio extraction failed: {result.stderr}")
+        raise RuntimeError("Failed to extract audio via ffmpeg.")
+    return output_path
 
-    frames = []
+def probe_video_packets(video_path: str) -> list:
+    """
+    Read the (pts_time, size, is_keyframe) of every video packet, sorted by time.
+
+    Only the container is demuxed, nothing is decoded, so this takes a fraction of the
+    time of a decode pass.
+    """
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,size,flags",
+        "-of", "csv=p=0", video_path
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        logger.error(f"ffprobe packet read failed: {result.stderr}")
+        raise RuntimeError("Failed to read packets via ffprobe.")
+
+    packets = []
+    for line in result.stdout.splitlines():
+        fields = line.strip().split(',')
+        if len(fields) < 3 or fields[0] in ('', 'N/A'):
+            continue
+        packets.append((float(fields[0]), int(fields[1]), 'K' in fields[2]))
+    packets.sort()
+    return packets
+
+def get_video_properties(video_path: str) -> dict:
+    """Return fps, frame_count, width and height of a video as reported by OpenCV."""
+    vidcap = cv2.VideoCapture(video_path)
+    if not vidcap.isOpened():
+        raise IOError(f"Cannot open video file {video_path}")
     try:
-        vidcap = cv2.VideoCapture(video_path)
-        if not vidcap.isOpened():
-            logger.error(f"Cannot open video file {video_path}")
-            raise IOError(f"Cannot open video file {video_path}")
-
-        total_frames = int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = vidcap.get(cv2.CAP_PROP_FPS)
-        logger.info(f"Video {video_path} has {total_frames} frames at {fps} FPS")
-
-        frame_count = 0
-        success, image = vidcap.read()
-        
-        while success:
-            rgb_frame = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            frames.append(rgb_frame)
-            
-            if frame_skip > 1:
-                for _ in range(frame_skip - 1):
-                    success, _ = vidcap.read()
-                    frame_count += 1
+        return {
+            'fps': vidcap.get(cv2.CAP_PROP_FPS),
+            'frame_count': int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            'width': int(vidcap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(vidcap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        vidcap.release()
+
+_END_OF_STREAM = object()
+
+def iter_frames(video_path: str, frame_skip: int = 1, buffer_size: int = None, rgb: bool = True,
+                start_frame: int = 0):
+    """
+    Stream decoded frames from `video_path` as (frame_index, frame) tuples.
+
+    A background thread decodes ahead of the consumer into a bounded queue, so at most
+    `buffer_size` frames (settings.FRAME_BUFFER_SIZE by default) are held in memory no
+    matter how long the video is. Skipped frames are only grabbed, never decoded to
+    pixels. Frames are RGB unless `rgb=False`, in which case OpenCV's BGR is kept.
+    A non-zero `start_frame` seeks there first; indices stay absolute.
+    """
+    frame_skip = max(1, frame_skip)
+    buffer_size = buffer_size or settings.FRAME_BUFFER_SIZE
+
+    vidcap = cv2.VideoCapture(video_path)
+    if not vidcap.isOpened():
+        logger.error(f"Cannot open video file {video_path}")
+        raise IOError(f"Cannot open video file {video_path}")
+    if start_frame:
+        vidcap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    frame_queue = queue.Queue(maxsize=buffer_size)
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        # Block while the consumer is behind, but give up once it has gone away
+        while not stop.is_set():
+            try:
+                frame_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _reader():
+        frame_idx = start_frame
+        try:
+            while not stop.is_set():
+                if (frame_idx - start_frame) % frame_skip:
+                    if not vidcap.grab():
+                        break
+                else:
+                    success, image = vidcap.read()
                     if not success:
                         break
-            
-            success, image = vidcap.read()
-            frame_count += 1
+                    if rgb:
+                        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+                    if not _put((frame_idx, image)):
+                        break
+                frame_idx += 1
+        except Exception as e:
+            logger.error(f"Error decoding frames from {video_path}: {e}")
+            _put(e)
+        finally:
+            _put(_END_OF_STREAM)
 
+    reader = threading.Thread(target=_reader, name="frame-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = frame_queue.get()
+            if item is _END_OF_STREAM:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        reader.join()
         vidcap.release()
-        logger.info(f"Extracted {len(frames)} frames from {video_path}. frame_skip={frame_skip}")
-        return frames
 
-    except Exception as e:
-        logger.error(f"Error extracting frames from {video_path}: {e}")
-        raise e
+def run_decode_pass(video_path: str, consumers: list, buffer_size: int = None) -> int:
+    """
+    Decode `video_path` once and hand every RGB frame to each consumer in order.
+
+    Consumers are callables taking (frame_index, frame); they must not modify the frame,
+    since the same array is shared by all of them. Returns the number of frames decoded.
+    """
+    frames_read = 0
+    for frame_idx, frame in iter_frames(video_path, buffer_size=buffer_size):
+        for consumer in consumers:
+            consumer(frame_idx, frame)
+        frames_read += 1
+    return frames_read
 
 def get_frame_at_time(video_path: str, time_sec: float) -> np.ndarray:
     vidcap = cv2.VideoCapture(video_path)
@@ -72,6 +250,22 @@ def get_frame_at_time(video_path: str, time_sec: float) -> np.ndarray:
         return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
     return None
 
+def read_frames_at(video_path: str, frame_indices: list):
+    """Yield (frame_index, RGB frame) for just the given frames, seeking to each in order."""
+    vidcap = cv2.VideoCapture(video_path)
+    if not vidcap.isOpened():
+        raise IOError(f"Cannot open video file {video_path}")
+    try:
+        for frame_idx in sorted(frame_indices):
+            vidcap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            success, image = vidcap.read()
+            if not success:
+                logger.warning(f"Could not read frame {frame_idx} of {video_path}")
+                continue
+            yield frame_idx, cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    finally:
+        vidcap.release()
+
 def generate_thumbnail(face_image: np.ndarray, video_id: int, speaker_id: int = None) -> str:
     try:
         thumbnail_size = (128, 128)
@@ -98,53 +292,116 @@ def generate_thumbnail(face_image: np.ndarray, video_id: int, speaker_id: int =
         logger.error(f"Error generating thumbnail for video_id={video_id}, speaker_id={speaker_id}: {e}")
         raise e
 
-def compile_video_with_audio(original_video_path: str, processed_frames: list, fps: float = None) -> str:
-    try:
-        logger.info(f"compile_video_with_audio called with {len(processed_frames)} frames and fps={fps}")
-        ffprobe_info(original_video_path, label="original before compile")
+class FFmpegFrameWriter:
+    """
+    Encoder sink backed by a single ffmpeg process.
 
-        original_clip = VideoFileClip(original_video_path)
-        original_duration = original_clip.duration
-        original_fps = original_clip.fps
-        logger.info(f"Original video ({original_video_path}) properties:")
-        logger.info(f"- Duration: {original_duration:.2f} seconds")
-        logger.info(f"- FPS: {original_fps}")
+    Raw RGB frames written with `write()` are piped to ffmpeg's stdin and encoded as they
+    arrive, and the audio of `audio_source` (if any) is muxed in by the same process, so
+    no frame list and no second pass are needed. Captions from the .ass file `subtitles`
+    are burned in by the same encode. Use as a context manager: a clean exit finalizes
+    the file, an exception kills the encoder and removes the partial output.
+    """
 
-        output_path = original_video_path.rsplit('.', 1)[0] + '_processed.mp4'
+    def __init__(self, output_path: str, fps: float, width: int = OUTPUT_WIDTH,
+                 height: int = OUTPUT_HEIGHT, audio_source: str = None, threads: int = None,
+                 profile: str = EncodingProfile.STANDARD, subtitles: str = None, start_time: float = 0.0):
+        self.output_path = output_path
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.audio_source = audio_source
+        self.threads = threads
+        self.profile = profile
+        self.subtitles = subtitles
+        self.start_time = start_time
+        self.frames_written = 0
+        self._proc = None
+        self._stderr = None
 
-        # If fps is None or calculated, fallback to original_fps from the original clip
-        final_fps = fps or original_fps
-        logger.info(f"Using final_fps={final_fps:.4f} for output video.")
+    def _build_command(self) -> list:
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24",
+            "-s", f"{self.width}x{self.height}",
+            "-r", f"{self.fps}",
+            "-i", "pipe:0",
+        ]
+        if self.audio_source:
+            cmd += ["-i", self.audio_source, "-map", "0:v:0", "-map", "1:a:0?"]
+        if self.subtitles:
+            cmd += ["-vf", subtitles_filter(self.subtitles, self.start_time)]
+        cmd += video_encoder_args(self.profile, threads=self.threads)
+        if self.audio_source:
+            cmd += audio_codec_args(self.audio_source) + ["-shortest"]
+        cmd.append(self.output_path)
+        return cmd
 
-        clip = ImageSequenceClip(processed_frames, fps=final_fps)
-        final_clip = clip.set_audio(original_clip.audio)
+    def open(self):
+        cmd = self._build_command()
+        logger.info(f"Starting ffmpeg encoder: {' '.join(cmd)}")
+        # stderr goes to a file so a chatty encoder can never block on a full pipe
+        self._stderr = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self._stderr)
+        return self
 
-        logger.info(f"Writing final video to {output_path}...")
-        final_clip.write_videofile(output_path, codec='libx264', audio_codec='aac', fps=final_fps)
+    def _error_output(self) -> str:
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors="replace")
 
-        clip.close()
-        final_clip.close()
-        original_clip.close()
+    def write(self, frame: np.ndarray):
+        if frame.shape[:2] != (self.height, self.width):
+            frame = cv2.resize(frame, (self.width, self.height))
+        try:
+            self._proc.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+        except BrokenPipeError:
+            self._proc.wait()
+            logger.error(f"ffmpeg encoder exited early: {self._error_output()}")
+            raise RuntimeError("ffmpeg encoder exited before all frames were written.")
+        self.frames_written += 1
 
-        ffprobe_info(output_path, label="final after compile")
+    def close(self) -> str:
+        self._proc.stdin.close()
+        returncode = self._proc.wait()
+        try:
+            if returncode != 0:
+                logger.error(f"ffmpeg encoding failed: {self._error_output()}")
+                raise RuntimeError("Failed to encode video via ffmpeg.")
+        finally:
+            self._stderr.close()
+        logger.info(f"Encoded {self.frames_written} frames to {self.output_path}")
+        return self.output_path
 
-        return output_path
+    def abort(self):
+        if self._proc and self._proc.poll() is None:
+            self._proc.kill()
+            self._proc.wait()
+        if self._stderr:
+            self._stderr.close()
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
 
-    except Exception as e:
-        logger.error(f"Error in compile_video_with_audio: {e}")
-        return None
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+            return False
+        self.close()
+        return False
 
 def determine_layout(num_speakers: int) -> dict:
     if num_speakers == 0:
         return {
-            'width': 1080,
-            'height': 1920,
+            'width': OUTPUT_WIDTH,
+            'height': OUTPUT_HEIGHT,
             'grid': [(0, 0, 1080, 1920)]
         }
     
     return {
-        'width': 1080,
-        'height': 1920,
+        'width': OUTPUT_WIDTH,
+        'height': OUTPUT_HEIGHT,
         'grid': {
             1: [(0, 0, 1080, 1920)],
             2: [(0, 0, 1080, 960), (0, 960, 1080, 1920)],
@@ -153,85 +410,180 @@ def determine_layout(num_speakers: int) -> dict:
         }[min(num_speakers, 4)]
     }
 
-def apply_layout_to_frame(frame: np.ndarray, identified_speakers: list, layout_config: dict) -> np.ndarray:
-    """Apply layout to frame with identified speakers"""
-    try:
-        out_w = layout_config['width']
-        out_h = layout_config['height']
-        canvas = np.zeros((out_h, out_w, 3), dtype=np.uint8)
-
-        def fit_to_canvas(img, target_w, target_h, orig_coords):
-            # Get original face region dimensions
-            orig_x1, orig_y1, orig_x2, orig_y2 = orig_coords
-            face_h, face_w = img.shape[:2]
-            
-            # Add significant padding around the face (150% on each side)
-            pad_x = int(face_w * 1.5)
-            pad_y = int(face_h * 1.5)
-            
-            # Calculate padded coordinates while keeping face centered
-            pad_y1 = max(0, orig_y1 - pad_y)
-            pad_y2 = min(frame.shape[0], orig_y2 + pad_y)
-            pad_x1 = max(0, orig_x1 - pad_x)
-            pad_x2 = min(frame.shape[1], orig_x2 + pad_x)
-            
-            # Extract the padded region
-            padded_img = frame[pad_y1:pad_y2, pad_x1:pad_x2]
-            if padded_img.size == 0:
-                return img
-            
-            # Scale to fill the target area completely
-            h, w = padded_img.shape[:2]
-            # Use max instead of min to ensure we fill the entire space
-            scale = max(target_w/w, target_h/h)
-            new_w = int(w * scale)
-            new_h = int(h * scale)
-            resized = cv2.resize(padded_img, (new_w, new_h))
-            
-            # Center and crop to target size
-            start_y = (new_h - target_h) // 2
-            start_x = (new_w - target_w) // 2
-            end_y = start_y + target_h
-            end_x = start_x + target_w
-            
-            # Ensure we don't exceed the resized image dimensions
-            start_y = max(0, min(start_y, new_h - target_h))
-            start_x = max(0, min(start_x, new_w - target_w))
-            end_y = min(new_h, start_y + target_h)
-            end_x = min(new_w, start_x + target_w)
-            
-            cropped = resized[start_y:end_y, start_x:end_x]
-            
-            # Final resize to ensure exact target dimensions
-            if cropped.shape[:2] != (target_h, target_w):
-                cropped = cv2.resize(cropped, (target_w, target_h))
-            
-            return cropped
+def clamp_box(box: tuple, frame_w: int, frame_h: int) -> tuple:
+    """
+    `box` (x1, y1, x2, y2) clipped to the frame. Detector boxes can run past the edges;
+    speaker boxes are clamped once when identified so every renderer crops the same region.
+    """
+    x1, y1, x2, y2 = box
+    x1, x2 = min(max(x1, 0), frame_w), min(max(x2, 0), frame_w)
+    y1, y2 = min(max(y1, 0), frame_h), min(max(y2, 0), frame_h)
+    return x1, y1, max(x1, x2), max(y1, y2)
+
+def compute_fit_transform(orig_coords: tuple, face_w: int, face_h: int, frame_w: int, frame_h: int,
+                          target_w: int, target_h: int) -> dict:
+    """
+    Geometry used to fit a face region into a `target_w` x `target_h` layout cell.
+
+    The face box is padded by 150% of its size on each side (clamped to the frame),
+    scaled so it covers the whole cell, then center-cropped. Returns the padded source
+    rectangle 'crop' as (x, y, w, h), the 'scaled' (w, h) size and the 'center_crop'
+    (x, y, w, h) taken from the scaled image, or None if the padded region is empty.
+    Shared by the numpy renderer and the ffmpeg filtergraph renderer so both agree.
+    """
+    orig_x1, orig_y1, orig_x2, orig_y2 = orig_coords
+
+    # Add significant padding around the face (150% on each side)
+    pad_x = int(face_w * 1.5)
+    pad_y = int(face_h * 1.5)
+
+    # Calculate padded coordinates while keeping face centered
+    pad_y1 = max(0, orig_y1 - pad_y)
+    pad_y2 = min(frame_h, orig_y2 + pad_y)
+    pad_x1 = max(0, orig_x1 - pad_x)
+    pad_x2 = min(frame_w, orig_x2 + pad_x)
+
+    w = pad_x2 - pad_x1
+    h = pad_y2 - pad_y1
+    if w <= 0 or h <= 0:
+        return None
+
+    # Use max instead of min to ensure we fill the entire space
+    scale = max(target_w/w, target_h/h)
+    new_w = int(w * scale)
+    new_h = int(h * scale)
+
+    # Center and crop to target size, without exceeding the resized image dimensions
+    start_y = max(0, min((new_h - target_h) // 2, new_h - target_h))
+    start_x = max(0, min((new_w - target_w) // 2, new_w - target_w))
+    end_y = min(new_h, start_y + target_h)
+    end_x = min(new_w, start_x + target_w)
+
+    return {
+        'crop': (pad_x1, pad_y1, w, h),
+        'scaled': (new_w, new_h),
+        'center_crop': (start_x, start_y, end_x - start_x, end_y - start_y),
+    }
+
+class LayoutPlan:
+    """
+    A scene's layout compiled for rendering its frames.
+
+    Without a grid the whole frame fills the canvas; otherwise each identified speaker's
+    box is fitted into its grid cell (see compute_fit_transform) and cells without a
+    speaker stay black. Within a scene the speaker boxes and the layout are fixed, so the
+    source slices, the scaled sizes and the canvas rectangles are worked out once here.
+    `render()` then only resizes into buffers allocated up front and copies into a reused
+    canvas.
+
+    The returned canvas is overwritten by the next `render()` call, so it must be consumed
+    (e.g. written to an encoder) first.
+    """
+
+    def __init__(self, identified_speakers: list, layout_config: dict, frame_w: int, frame_h: int):
+        self.frame_w = frame_w
+        self.frame_h = frame_h
+        self.canvas = np.zeros((layout_config['height'], layout_config['width'], 3), dtype=np.uint8)
+        # One entry per drawn cell: (source slice, scaled buffer, center crop slice, canvas view, cell size)
+        self.cells = []
 
         grid = layout_config.get('grid', [])
         if not grid:
-            # Single layout
-            fitted = fit_to_canvas(frame, out_w, out_h, (0, 0, frame.shape[1], frame.shape[0]))
-            canvas = fitted  # Direct assignment since it's already the right size
-            return canvas
+            self._add_cell((0, 0, frame_w, frame_h), frame_w, frame_h, self.canvas)
+            return
 
-        # Multiple speakers
         for i, (speaker_id, (x1, y1, x2, y2)) in enumerate(identified_speakers[:len(grid)]):
-            speaker_img = frame[y1:y2, x1:x2]
-            if speaker_img.size == 0:
+            # Boxes are clamped to the frame when identified (clamp_box)
+            face_w = x2 - x1
+            face_h = y2 - y1
+            if face_w <= 0 or face_h <= 0:
                 logger.warning(f"Speaker ID {speaker_id} has empty image. Skipping.")
                 continue
-            
             gx1, gy1, gx2, gy2 = grid[i]
-            region_w = gx2 - gx1
-            region_h = gy2 - gy1
-            
-            # Fit the image to exactly fill the grid region
-            fitted = fit_to_canvas(speaker_img, region_w, region_h, (x1, y1, x2, y2))
-            canvas[gy1:gy2, gx1:gx2] = fitted
+            self._add_cell((x1, y1, x2, y2), face_w, face_h, self.canvas[gy1:gy2, gx1:gx2])
 
-        return canvas
+    def _add_cell(self, orig_coords: tuple, face_w: int, face_h: int, canvas_view: np.ndarray):
+        target_h, target_w = canvas_view.shape[:2]
+        t = compute_fit_transform(orig_coords, face_w, face_h, self.frame_w, self.frame_h, target_w, target_h)
+        if t is None:
+            logger.warning(f"Empty padded region for {orig_coords}, leaving the cell black")
+            return
 
-    except Exception as e:
-        logger.error(f"Error in apply_layout_to_frame: {e}")
-        return frame
\ No newline at end of file
+        cx, cy, cw, ch = t['crop']
+        new_w, new_h = t['scaled']
+        sx, sy, sw, sh = t['center_crop']
+        source = (slice(cy, cy + ch), slice(cx, cx + cw))
+        scaled = np.empty((new_h, new_w, 3), dtype=np.uint8)
+        center_crop = (slice(sy, sy + sh), slice(sx, sx + sw))
+        # Rare rounding case: the crop falls short of the cell and needs a second resize
+        fixup = None
+        if (sw, sh) != (target_w, target_h):
+            fixup = np.empty((target_h, target_w, 3), dtype=np.uint8)
+        self.cells.append((source, scaled, center_crop, canvas_view, fixup))
+
+    def render(self, frame: np.ndarray) -> np.ndarray:
+        for source, scaled, center_crop, canvas_view, fixup in self.cells:
+            cv2.resize(frame[source], (scaled.shape[1], scaled.shape[0]), dst=scaled)
+            if fixup is None:
+                np.copyto(canvas_view, scaled[center_crop])
+            else:
+                cv2.resize(scaled[center_crop], (fixup.shape[1], fixup.shape[0]), dst=fixup)
+                np.copyto(canvas_view, fixup)
+        return self.canvas
+
+class ScenePlanCache:
+    """
+    Renders frames in timeline order with the LayoutPlan of their scene dict.
+
+    Only the current scene's plan is kept; frames arrive scene by scene, and a plan holds a
+    full output canvas, so keeping every scene's plan would grow with the video.
+    """
+
+    def __init__(self, frame_w: int, frame_h: int):
+        self.frame_w = frame_w
+        self.frame_h = frame_h
+        self._scene_start = None
+        self._plan = None
+
+    def render(self, scene: dict, frame: np.ndarray) -> np.ndarray:
+        if self._plan is None or scene['start_frame'] != self._scene_start:
+            self._plan = LayoutPlan(scene['identified'], scene['layout_config'], self.frame_w, self.frame_h)
+            self._scene_start = scene['start_frame']
+        return self._plan.render(frame)
+
+def scene_frame_ranges(scenes: list, total_frames: int) -> list:
+    """
+    Pair each scene dict from SceneLayoutTracker with its [start_frame, end_frame) range.
+    """
+    ranges = []
+    for i, scene in enumerate(scenes):
+        end_frame = scenes[i + 1]['start_frame'] if i + 1 < len(scenes) else total_frames
+        if end_frame > scene['start_frame']:
+            ranges.append((scene['start_frame'], end_frame, scene))
+    return ranges
+
+def render_frame_range(input_path: str, output_path: str, scenes: list, start_frame: int, end_frame: int,
+                       fps: float, threads: int = None, profile: str = EncodingProfile.STANDARD,
+                       subtitles: str = None) -> str:
+    """
+    Render frames [start_frame, end_frame) of `input_path` to a silent segment file,
+    burning in the captions of `subtitles` for that time range if given.
+
+    Used as a process-pool worker, so it lives here rather than in app.services to keep
+    worker start-up light; it only needs the already decided scene layouts.
+    """
+    ranges = scene_frame_ranges(scenes, end_frame)
+    props = get_video_properties(input_path)
+    plans = ScenePlanCache(props['width'], props['height'])
+    scene_idx = 0
+    with FFmpegFrameWriter(output_path, fps=fps, threads=threads, profile=profile,
+                           subtitles=subtitles, start_time=start_frame / fps) as writer:
+        for frame_idx, frame in iter_frames(input_path, start_frame=start_frame):
+            if frame_idx >= end_frame:
+                break
+            while scene_idx + 1 < len(ranges) and frame_idx >= ranges[scene_idx][1]:
+                scene_idx += 1
+            writer.write(plans.render(ranges[scene_idx][2], frame))
+        if writer.frames_written == 0:
+            raise ValueError(f"No frames rendered for segment {start_frame}-{end_frame}.")
+    return output_path
@@ -0,0 +1,43 @@
+# backend/workers/model_manifest.py
+
+"""
+Record the sha256 of every model artifact in MODEL_DIR/manifest.json.
+
+Run from backend/ after placing or updating weights in MODEL_DIR:
+
+    python -m workers.model_manifest
+
+Every model in MODEL_ARTIFACTS must be present; otherwise nothing is written and the
+script exits with an error naming the missing ones.
+"""
+
+import json
+import os
+import sys
+
+from app.config import settings
+from app.utils.file_utils import file_sha256
+from app.utils.model_registry import MODEL_ARTIFACTS, MANIFEST_FILE, artifact_files, artifact_path
+
+def main():
+    manifest = {}
+    missing = []
+    for name in MODEL_ARTIFACTS:
+        if not os.path.exists(artifact_path(name)):
+            print(f"{name:<16}missing at {artifact_path(name)}")
+            missing.append(name)
+            continue
+        manifest[name] = {
+            relpath: file_sha256(os.path.join(settings.MODEL_DIR, relpath))
+            for relpath in artifact_files(name)
+        }
+        print(f"{name:<16}{len(manifest[name])} file(s)")
+
+    if missing:
+        sys.exit(f"Missing model artifacts: {', '.join(missing)}; {MANIFEST_FILE} not written")
+
+    with open(os.path.join(settings.MODEL_DIR, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+if __name__ == "__main__":
+    main()
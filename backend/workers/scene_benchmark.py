@@ -0,0 +1,36 @@
+# backend/workers/scene_benchmark.py
+
+"""
+Compare scene detection engines on a labelled clip set.
+
+The label file is JSON: [{"path": "clip.mp4", "cuts": [120, 348, ...]}, ...] with the
+frame numbers where each new shot starts. Run from backend/:
+
+    python -m workers.scene_benchmark labels.json --engines mean_diff histogram
+"""
+
+import argparse
+import json
+
+from app.services.scene_detection import evaluate_scene_engine
+from app.utils.scene_detectors import SceneEngine
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scene detection engines.")
+    parser.add_argument("labels", help="JSON file with the labelled clips")
+    parser.add_argument("--engines", nargs="+", choices=[e.value for e in SceneEngine],
+                        default=[e.value for e in SceneEngine])
+    parser.add_argument("--tolerance", type=int, default=2, help="Frames a cut may be off by")
+    args = parser.parse_args()
+
+    with open(args.labels, 'r', encoding='utf-8') as f:
+        clips = json.load(f)
+
+    print(f"{'engine':<12}{'fps':>10}{'precision':>11}{'recall':>9}{'f1':>7}")
+    for engine in args.engines:
+        result = evaluate_scene_engine(engine, clips, tolerance_frames=args.tolerance)
+        print(f"{result['engine']:<12}{result['fps']:>10.1f}{result['precision']:>11.3f}"
+              f"{result['recall']:>9.3f}{result['f1']:>7.3f}")
+
+if __name__ == "__main__":
+    main()